@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Bank Manager API - local HTTP/JSON access to the card vault
+
+Run:  python bank_api_server.py --port 8765
+
+GET    /cards          masked cards, newest first; query parameters member, bank,
+                       type, network, expires_from, expires_to, search, limit and
+                       after_created_at + after_id (from the previous page's "next")
+GET    /cards/<id>     one card, masked
+POST   /cards          add a card from a JSON object of card fields
+PUT    /cards/<id>     replace a card's fields
+DELETE /cards/<id>     delete a card
+GET    /stats          card counts by type, network, bank and member
+GET    /metrics        request counts, latency percentiles and throughput
+
+The master password is read from BANK_MANAGER_PASSWORD, as for bank_cli.py. If
+BANK_MANAGER_API_TOKEN is set, requests must send "Authorization: Bearer <token>".
+Reads run concurrently on the vault's read-only connections; writes go one at a
+time through its single writer.
+"""
+
+import argparse
+import asyncio
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from bank_cli import DEFAULT_DB_PATH, LIST_FILTER_OPTIONS, CommandError, read_password
+from bank_database import CARD_FIELDS, CARD_VALIDATOR, CompleteDatabase, DuplicateCardError, JobCancelled
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+TOKEN_ENV_VAR = 'BANK_MANAGER_API_TOKEN'
+
+# Seconds a request may take, from its first byte to the end of its work
+REQUEST_TIMEOUT = 10.0
+
+# Threads serving reads; each holds one of the vault's read-only connections
+READ_WORKERS = 4
+
+# Request limits
+MAX_HEADER_LINES = 100
+MAX_BODY_SIZE = 64 * 1024
+
+# Page size for GET /cards when limit is not given, and its upper bound
+LIST_DEFAULT_LIMIT = 100
+LIST_MAX_LIMIT = 1000
+
+# Latency samples kept per route, and the window for the recent request rate
+METRICS_SAMPLES = 1000
+METRICS_RATE_WINDOW = 60.0
+
+class HttpError(Exception):
+    """Ends a request with an HTTP error status and a JSON {"error": message} body
+    
+    errors, if given, is added to the body as a list of details.
+    """
+    
+    def __init__(self, status, message, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.errors = errors
+
+class ServerMetrics:
+    """Request counters and per-route latency samples"""
+    
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.in_flight = 0
+        self.timeouts = 0
+        self.statuses = {}
+        self._latencies = {}
+        self._completed = deque()
+        self._lock = threading.Lock()
+    
+    def record(self, route, status, seconds):
+        """Count one finished request"""
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self._latencies.setdefault(route, deque(maxlen=METRICS_SAMPLES)).append(seconds * 1000)
+            self._completed.append(now)
+            while self._completed and self._completed[0] < now - METRICS_RATE_WINDOW:
+                self._completed.popleft()
+    
+    def snapshot(self):
+        """Counters, request rates and per-route p50/p95/p99/max milliseconds"""
+        now = time.monotonic()
+        with self._lock:
+            uptime = now - self.started
+            recent = sum(1 for finished in self._completed if finished >= now - METRICS_RATE_WINDOW)
+            routes = {}
+            for route, samples in self._latencies.items():
+                values = sorted(samples)
+                routes[route] = {
+                    'samples': len(values),
+                    'p50': self._percentile(values, 50),
+                    'p95': self._percentile(values, 95),
+                    'p99': self._percentile(values, 99),
+                    'max': values[-1]
+                }
+            return {
+                'uptime_seconds': uptime,
+                'requests': self.requests,
+                'in_flight': self.in_flight,
+                'timeouts': self.timeouts,
+                'requests_per_second': self.requests / uptime if uptime else 0.0,
+                'recent_requests_per_second': recent / min(uptime, METRICS_RATE_WINDOW) if uptime else 0.0,
+                'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+                'routes': routes
+            }
+    
+    @staticmethod
+    def _percentile(values, percent):
+        """Nearest-rank percentile of an already sorted list"""
+        rank = max(1, -(-len(values) * percent // 100))
+        return values[rank - 1]
+
+class CardApiServer:
+    """Minimal HTTP/1.1 JSON server over a CompleteDatabase"""
+    
+    # (method, path pattern, handler name, 'read' or 'write')
+    ROUTES = [
+        ('GET', r'/cards', 'list_cards', 'read'),
+        ('GET', r'/cards/(\d+)', 'get_card', 'read'),
+        ('POST', r'/cards', 'create_card', 'write'),
+        ('PUT', r'/cards/(\d+)', 'update_card', 'write'),
+        ('DELETE', r'/cards/(\d+)', 'delete_card', 'write'),
+        ('GET', r'/stats', 'card_stats', 'read'),
+    ]
+    
+    def __init__(self, database, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                 timeout=REQUEST_TIMEOUT, read_workers=READ_WORKERS, token=None):
+        self.database = database
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.token = token
+        self.metrics = ServerMetrics()
+        self.routes = [
+            (method, re.compile(pattern + '$'), getattr(self, name), kind)
+            for method, pattern, name, kind in self.ROUTES
+        ]
+        
+        # Reads share the connection pool; the one write thread mirrors the single writer
+        self.read_pool = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix='api-read')
+        self.write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='api-write')
+        self.server = None
+    
+    async def start(self):
+        """Start listening; returns the bound (host, port)"""
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        return self.server.sockets[0].getsockname()[:2]
+    
+    async def serve_forever(self):
+        """Serve until cancelled"""
+        async with self.server:
+            await self.server.serve_forever()
+    
+    def close(self):
+        """Stop accepting connections and wait for running database work"""
+        if self.server is not None:
+            self.server.close()
+        self.read_pool.shutdown(wait=True, cancel_futures=True)
+        self.write_pool.shutdown(wait=True, cancel_futures=True)
+    
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one keep-alive connection"""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self.read_request(reader), self.timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except HttpError as e:
+                    await self.write_response(writer, e.status, {'error': str(e)}, keep_alive=False)
+                    return
+                if request is None:
+                    return
+                
+                method, path, query, headers, body = request
+                started = time.monotonic()
+                self.metrics.in_flight += 1
+                try:
+                    route, status, payload = await self.dispatch(method, path, query, headers, body)
+                finally:
+                    self.metrics.in_flight -= 1
+                self.metrics.record(route, status, time.monotonic() - started)
+                
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self.write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    async def read_request(self, reader):
+        """Parse one request, or return None when the client closed the connection"""
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, _ = request_line.decode('latin-1').split()
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers")
+        
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length < 0:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        body = await reader.readexactly(length) if length else b''
+        
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        return method.upper(), url.path.rstrip('/') or '/', query, headers, body
+    
+    async def write_response(self, writer, status, payload, keep_alive=True):
+        """Send a JSON response"""
+        body = json.dumps(payload).encode('utf-8')
+        status = HTTPStatus(status)
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            f"\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+    
+    async def dispatch(self, method, path, query, headers, body):
+        """Run the matching handler; returns (route label, status, payload)"""
+        # Unmatched paths share one label so stray requests can't grow the metrics
+        route = 'unmatched'
+        try:
+            if self.token and not hmac.compare_digest(
+                    headers.get('authorization', ''), f"Bearer {self.token}"):
+                raise HttpError(HTTPStatus.UNAUTHORIZED, "Missing or invalid API token")
+            
+            if method == 'GET' and path == '/metrics':
+                return 'GET /metrics', HTTPStatus.OK, self.server_metrics()
+            
+            path_matched = False
+            for route_method, pattern, handler, kind in self.routes:
+                match = pattern.match(path)
+                if not match:
+                    continue
+                path_matched = True
+                if route_method != method:
+                    continue
+                
+                route = f"{method} {pattern.pattern[:-1]}".replace(r'(\d+)', '{id}')
+                args = [int(group) for group in match.groups()]
+                if method in ('POST', 'PUT'):
+                    args.append(self.parse_json(body))
+                if method == 'GET' and not args:
+                    args.append(query)
+                status, payload = await self.run(kind, handler, *args)
+                return route, status, payload
+            
+            if path_matched:
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed on {path}")
+            raise HttpError(HTTPStatus.NOT_FOUND, f"No route for {path}")
+        
+        except HttpError as e:
+            if e.errors:
+                return route, e.status, {'error': str(e), 'errors': e.errors}
+            return route, e.status, {'error': str(e)}
+        except DuplicateCardError as e:
+            return route, HTTPStatus.CONFLICT, {'error': str(e)}
+        except asyncio.TimeoutError:
+            self.metrics.timeouts += 1
+            return route, HTTPStatus.GATEWAY_TIMEOUT, {
+                'error': f"Request took longer than {self.timeout:g}s; a write that had started may still complete"
+            }
+        except Exception as e:
+            return route, HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+    
+    async def run(self, kind, handler, *args):
+        """Run a blocking handler on the read or write pool, within the request timeout"""
+        abandoned = threading.Event()
+        
+        def work():
+            # Don't start work whose request has already timed out
+            if abandoned.is_set():
+                raise JobCancelled("Request abandoned")
+            return handler(*args)
+        
+        pool = self.read_pool if kind == 'read' else self.write_pool
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(pool, work), self.timeout)
+        except asyncio.TimeoutError:
+            abandoned.set()
+            raise
+    
+    def parse_json(self, body):
+        """Decode a JSON object request body"""
+        try:
+            value = json.loads(body or b'null')
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Request body is not valid JSON")
+        if not isinstance(value, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+        return value
+    
+    def card_fields(self, body, stored=None):
+        """Validate a card body with the shared card rules; returns add_card/update_card arguments
+        
+        stored is the card being replaced, whose unchanged fields are not checked again.
+        """
+        unknown = set(body) - set(CARD_FIELDS)
+        if unknown:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"Unknown card field: {', '.join(sorted(unknown))}")
+        
+        card, errors = CARD_VALIDATOR.validate(body, stored)
+        if errors:
+            raise HttpError(HTTPStatus.UNPROCESSABLE_ENTITY,
+                            f"Invalid card: {errors[0].field} ({errors[0].rule})",
+                            [error._asdict() for error in errors])
+        return CARD_VALIDATOR.values(card)
+    
+    def masked_card(self, card):
+        """A full card record with its secrets masked"""
+        card = dict(card)
+        card['account_number'] = self.database.mask_card_number(card['account_number'])
+        card['atm_number'] = self.database.mask_card_number(card['atm_number'])
+        card['cvv'] = self.database.mask_cvv(card['cvv'])
+        card['pin'] = '****'
+        return card
+    
+    def list_cards(self, query):
+        """GET /cards"""
+        filters = {
+            name: query[option]
+            for option, name in LIST_FILTER_OPTIONS.items()
+            if query.get(option)
+        }
+        if query.get('search'):
+            filters['search'] = query['search']
+        
+        try:
+            limit = int(query.get('limit', LIST_DEFAULT_LIMIT))
+            after = None
+            if 'after_id' in query:
+                after = (query.get('after_created_at', ''), int(query['after_id']))
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "limit and after_id must be integers")
+        if not 0 < limit <= LIST_MAX_LIMIT:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"limit must be between 1 and {LIST_MAX_LIMIT}")
+        
+        cards = self.database.query_cards(filters, after, limit)
+        next_page = None
+        if len(cards) == limit:
+            next_page = {'after_created_at': cards[-1].created_at, 'after_id': cards[-1].id}
+        return HTTPStatus.OK, {'cards': [card._asdict() for card in cards], 'next': next_page}
+    
+    def get_card(self, card_id):
+        """GET /cards/<id>"""
+        card = self.database.get_card_by_id(card_id)
+        if card is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"No card with id {card_id}")
+        return HTTPStatus.OK, self.masked_card(card)
+    
+    def create_card(self, body):
+        """POST /cards"""
+        card_id = self.database.add_card(*self.card_fields(body))
+        return HTTPStatus.CREATED, {'id': card_id}
+    
+    def update_card(self, card_id, body):
+        """PUT /cards/<id>"""
+        stored = self.database.get_card_by_id(card_id)
+        if stored is None or not self.database.update_card(card_id, *self.card_fields(body, stored)):
+            raise HttpError(HTTPStatus.NOT_FOUND, f"No card with id {card_id}")
+        return HTTPStatus.OK, {'id': card_id}
+    
+    def delete_card(self, card_id):
+        """DELETE /cards/<id>"""
+        if not self.database.delete_card(card_id):
+            raise HttpError(HTTPStatus.NOT_FOUND, f"No card with id {card_id}")
+        return HTTPStatus.OK, {'id': card_id}
+    
+    def card_stats(self, query):
+        """GET /stats"""
+        return HTTPStatus.OK, self.database.get_card_stats()
+    
+    def server_metrics(self):
+        """GET /metrics, answered on the event loop so it works while the pools are busy"""
+        metrics = self.metrics.snapshot()
+        metrics['database'] = {
+            'cache': self.database.cache_stats(),
+            'operations': self.database.latency_stats()
+        }
+        return metrics
+
+async def serve(server):
+    """Run server until interrupted"""
+    host, port = await server.start()
+    print(f"Serving the card vault on http://{host}:{port}", file=sys.stderr)
+    await server.serve_forever()
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON API over the bank card vault")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="vault file (default: %(default)s)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to bind (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to bind (default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT,
+                        help="seconds allowed per request (default: %(default)s)")
+    parser.add_argument("--read-workers", type=int, default=READ_WORKERS,
+                        help="concurrent read requests (default: %(default)s)")
+    args = parser.parse_args(argv)
+    
+    try:
+        if not os.path.exists(args.db):
+            raise CommandError(f"No vault at {args.db}")
+        database = CompleteDatabase(read_password(), args.db, read_pool_size=args.read_workers)
+    except Exception as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    if database.duplicate_cards:
+        print(f"warning: {database.duplicate_cards_message()}; imports are disabled until they are resolved",
+              file=sys.stderr)
+    
+    server = CardApiServer(database, args.host, args.port, args.timeout, args.read_workers,
+                           token=os.environ.get(TOKEN_ENV_VAR) or None)
+    try:
+        asyncio.run(serve(server))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        database.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
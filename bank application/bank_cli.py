@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Bank Manager CLI - import, export, listing and stats without the GUI
+
+Import:  python bank_cli.py import cards.csv
+Export:  python bank_cli.py export backup.xlsx
+Delta:   python bank_cli.py export changes.delta.ndjson --checkpoint nightly
+List:    python bank_cli.py list --member John --type Debit --format json
+Stats:   python bank_cli.py stats --format json
+Expiry:  python bank_cli.py expiring --days 30
+Key:     python bank_cli.py natural-key --set atm_number family_member
+
+The master password is read from BANK_MANAGER_PASSWORD, or prompted for when
+running on a terminal. Never imports tkinter, so it runs without a display.
+"""
+
+import argparse
+import getpass
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+
+from bank_database import (CARD_SORTS, CHANGE_LOG_COLUMNS, DEFAULT_CARD_SORT, DEFAULT_CHECKPOINT, EXPIRY_ALERT_DAYS,
+                           CompleteDatabase)
+
+DEFAULT_DB_PATH = 'complete_bank_manager.db'
+PASSWORD_ENV_VAR = 'BANK_MANAGER_PASSWORD'
+MIN_PASSWORD_LENGTH = 8
+
+# Cards fetched per keyset page when listing
+LIST_PAGE_SIZE = 500
+
+# list option -> CARD_FILTERS name
+LIST_FILTER_OPTIONS = {
+    'member': 'family_member',
+    'bank': 'bank_name',
+    'type': 'card_type',
+    'network': 'card_network',
+    'expires_from': 'expiry_from',
+    'expires_to': 'expiry_to',
+}
+
+# Columns of the text listing: (card key, header, width)
+LIST_TEXT_COLUMNS = [
+    ('id', 'ID', 6),
+    ('bank_name', 'Bank', 18),
+    ('branch_name', 'Branch', 16),
+    ('atm_number', 'ATM Number', 19),
+    ('card_type', 'Type', 7),
+    ('card_network', 'Network', 16),
+    ('family_member', 'Member', 12),
+    ('validity_end', 'Valid Until', 11),
+]
+
+class CommandError(Exception):
+    """A user-facing failure: printed without a traceback, exit status 1"""
+
+def read_password():
+    """Master password from the environment, or a prompt on a terminal"""
+    password = os.environ.get(PASSWORD_ENV_VAR)
+    if password is None:
+        if not sys.stdin.isatty():
+            raise CommandError(f"Set {PASSWORD_ENV_VAR} to run without a terminal")
+        password = getpass.getpass("Master password: ")
+    
+    if len(password) < MIN_PASSWORD_LENGTH:
+        raise CommandError(f"Password must be at least {MIN_PASSWORD_LENGTH} characters long")
+    return password
+
+def open_database(args):
+    """Open the vault named by --db"""
+    if args.command != 'import' and not os.path.exists(args.db):
+        raise CommandError(f"No vault at {args.db}")
+    database = CompleteDatabase(read_password(), args.db)
+    if database.duplicate_cards:
+        print(f"warning: {database.duplicate_cards_message()}; imports are disabled until they are resolved",
+              file=sys.stderr)
+    return database
+
+def write_json(value):
+    """Print one JSON document to stdout"""
+    json.dump(value, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+def write_json_array(values):
+    """Print a JSON array one element at a time, laid out like write_json"""
+    separator = '[\n  '
+    for value in values:
+        sys.stdout.write(separator)
+        sys.stdout.write(json.dumps(value, indent=2).replace('\n', '\n  '))
+        separator = ',\n  '
+    sys.stdout.write('[]\n' if separator == '[\n  ' else '\n]\n')
+
+def iter_listed_cards(database, filters, limit, sort=DEFAULT_CARD_SORT, descending=True):
+    """Masked ListedCards matching filters in sort order, up to limit (0 = all)"""
+    page_size = min(LIST_PAGE_SIZE, limit) if limit else LIST_PAGE_SIZE
+    cards = database.iter_listed_cards(filters, sort, descending, page_size)
+    return itertools.islice(cards, limit) if limit else cards
+
+def run_import(database, args):
+    """Import cards from a file, all-or-nothing unless --partial"""
+    rejections = []
+    summary = database.import_file(args.file, atomic=not args.partial, rejections=rejections)
+    
+    if args.format == 'json':
+        write_json(dict(
+            summary._asdict(),
+            file=args.file,
+            rejections=[rejection._asdict() for rejection in rejections]
+        ))
+    else:
+        print(f"Imported {summary.imported} cards from {args.file} "
+              f"({summary.inserted} new, {summary.updated} updated, {summary.unchanged} unchanged, "
+              f"{summary.deleted} deleted), "
+              f"skipped {summary.skipped}")
+        for rejection in rejections:
+            print(f"  row {rejection.row}: {rejection.field} ({rejection.rule})")
+    return 0
+
+def run_export(database, args):
+    """Export every card to a file whose extension picks the format"""
+    file_format = database.file_format(args.file)
+    count = database.export_file(args.file, checkpoint=args.checkpoint)
+    
+    if args.format == 'json':
+        write_json({'file': args.file, 'format': file_format, 'cards': count})
+    elif file_format == 'delta':
+        print(f"Exported {count} changes since checkpoint '{args.checkpoint}' to {args.file}")
+    else:
+        print(f"Exported {count} cards to {args.file}")
+    return 0
+
+def run_list(database, args):
+    """List masked cards matching the filters"""
+    filters = {
+        name: getattr(args, option)
+        for option, name in LIST_FILTER_OPTIONS.items()
+        if getattr(args, option)
+    }
+    if args.search:
+        filters['search'] = args.search
+    if args.sort:
+        cards = iter_listed_cards(database, filters, args.limit, args.sort, args.descending)
+    else:
+        cards = iter_listed_cards(database, filters, args.limit)
+    write_cards(cards, args.format)
+    return 0
+
+def run_expiring(database, args):
+    """List masked cards expiring within --days, soonest first"""
+    write_cards(database.get_expiring_cards(args.days), args.format)
+    return 0
+
+def write_cards(cards, output_format):
+    """Print ListedCards as a text table, a JSON array or NDJSON, as they arrive"""
+    if output_format == 'json':
+        write_json_array(card._asdict() for card in cards)
+    elif output_format == 'ndjson':
+        for card in cards:
+            sys.stdout.write(json.dumps(card._asdict()) + '\n')
+    else:
+        print('  '.join(header.ljust(width) for _, header, width in LIST_TEXT_COLUMNS).rstrip())
+        for card in cards:
+            print('  '.join(
+                str(getattr(card, key))[:width].ljust(width) for key, _, width in LIST_TEXT_COLUMNS
+            ).rstrip())
+
+def run_stats(database, args):
+    """Print the card count and per-value breakdowns"""
+    stats = database.get_card_stats()
+    
+    if args.format == 'json':
+        write_json(stats)
+        return 0
+    
+    print(f"Total cards: {stats.pop('total_cards')}")
+    for name, counts in stats.items():
+        print(f"\n{name.replace('_', ' ').title()}:")
+        for value, count in counts.items():
+            print(f"  {value}: {count}")
+    return 0
+
+def run_natural_key(database, args):
+    """Show the columns that identify a card across imports, or change them"""
+    if args.set:
+        database.change_natural_key(args.set)
+    
+    if args.format == 'json':
+        write_json({'natural_key': list(database.natural_key)})
+    else:
+        print(f"Natural key: {', '.join(database.natural_key)}")
+    return 0
+
+COMMANDS = {
+    'import': run_import,
+    'export': run_export,
+    'list': run_list,
+    'stats': run_stats,
+    'expiring': run_expiring,
+    'natural-key': run_natural_key,
+}
+
+def build_parser():
+    """Argument parser with one subcommand per COMMANDS entry"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=DEFAULT_DB_PATH, help="vault file (default: %(default)s)")
+    
+    formats = argparse.ArgumentParser(add_help=False)
+    formats.add_argument("--format", choices=["text", "json"], default="text",
+                         help="output format (default: %(default)s)")
+    
+    parser = argparse.ArgumentParser(description="Batch operations on the bank card vault")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    import_cmd = commands.add_parser("import", parents=[common, formats],
+                                     help="import cards from .xlsx, .csv, .ndjson (optionally .gz) or a .delta.ndjson delta")
+    import_cmd.add_argument("file")
+    import_cmd.add_argument("--partial", action="store_true",
+                            help="commit chunk by chunk instead of all-or-nothing")
+    
+    export_cmd = commands.add_parser("export", parents=[common, formats],
+                                     help="export cards to .xlsx, .csv, .ndjson or .json (optionally .gz), or changes to .delta.ndjson")
+    export_cmd.add_argument("file")
+    export_cmd.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT,
+                            help="for .delta.ndjson: export changes since this checkpoint, "
+                                 "then advance it (default: %(default)s)")
+    
+    list_cmd = commands.add_parser("list", parents=[common], help="list masked cards, newest first unless --sort")
+    list_cmd.add_argument("--format", choices=["text", "json", "ndjson"], default="text",
+                          help="output format (default: %(default)s)")
+    list_cmd.add_argument("--member", help="family member")
+    list_cmd.add_argument("--bank", help="bank name")
+    list_cmd.add_argument("--type", choices=["Debit", "Credit"], help="card type")
+    list_cmd.add_argument("--network", help="card network")
+    list_cmd.add_argument("--expires-from", metavar="YYYY-MM-DD", help="earliest expiry date")
+    list_cmd.add_argument("--expires-to", metavar="YYYY-MM-DD", help="latest expiry date")
+    list_cmd.add_argument("--search", help="free text matched against bank, branch, IFSC and member")
+    list_cmd.add_argument("--limit", type=int, default=100, help="maximum cards, 0 for all (default: %(default)s)")
+    list_cmd.add_argument("--sort", choices=sorted(CARD_SORTS), help="sort by this field instead of newest first")
+    list_cmd.add_argument("--descending", action="store_true", help="reverse the --sort order")
+    
+    commands.add_parser("stats", parents=[common, formats], help="card counts by type, network, bank and member")
+    
+    expiring_cmd = commands.add_parser("expiring", parents=[common], help="list masked cards expiring soon, soonest first")
+    expiring_cmd.add_argument("--format", choices=["text", "json", "ndjson"], default="text",
+                              help="output format (default: %(default)s)")
+    expiring_cmd.add_argument("--days", type=int, default=EXPIRY_ALERT_DAYS,
+                              help="days ahead to look (default: %(default)s)")
+    
+    key_cmd = commands.add_parser("natural-key", parents=[common, formats],
+                                  help="show or change the columns that identify a card across imports")
+    key_cmd.add_argument("--set", nargs="+", choices=CHANGE_LOG_COLUMNS, metavar="COLUMN",
+                         help="match cards on these columns from now on; fails if existing cards share a value")
+    return parser
+
+def main(argv=None):
+    """Command line entry point"""
+    args = build_parser().parse_args(argv)
+    
+    database = None
+    try:
+        database = open_database(args)
+        return COMMANDS[args.command](database, args)
+    except Exception as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if database is not None:
+            database.close()
+
+if __name__ == '__main__':
+    # Import workers re-launch the packaged executable on Windows
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,2638 @@
+#!/usr/bin/env python3
+"""
+Bank Database - the card vault storage layer, shared by the GUI and the command line
+
+Nothing here imports tkinter, so scripts can use CompleteDatabase without a display.
+"""
+
+import sqlite3
+import csv
+import functools
+import gzip
+import itertools
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+# openpyxl and the process pool are imported where they are used: together
+# they cost more than the rest of startup, and most sessions never need them
+
+# Shared SQL text so each connection's statement cache is reused across calls
+CARD_COLUMNS = '''id, bank_name, branch_name, ifsc_code, account_number, atm_number, 
+                   pin, validity_start, validity_end, cvv, card_type, card_network,
+                   family_member, created_at, updated_at'''
+
+SELECT_ALL_CARDS_SQL = f'''
+            SELECT {CARD_COLUMNS}
+            FROM bank_cards
+            ORDER BY created_at DESC
+        '''
+
+# SQL twin of CompleteDatabase.mask_card_number, used to backfill display columns
+MASK_CARD_NUMBER_SQL = '''CASE WHEN length({column}) >= 16
+                THEN substr({column}, 1, 4) || ' **** **** ' || substr({column}, -4)
+                ELSE '**** **** **** ****' END'''
+
+# Full card with secrets masked inside SQLite
+MASKED_CARD_COLUMNS = '''id, bank_name, branch_name, ifsc_code, account_display, atm_display,
+                   CASE length(pin) WHEN 3 THEN '***' ELSE '**' END, validity_start, validity_end,
+                   CASE length(cvv) WHEN 3 THEN '***' ELSE '**' END, card_type, card_network,
+                   family_member, created_at, updated_at'''
+
+SELECT_ALL_MASKED_CARDS_SQL = f'''
+            SELECT {MASKED_CARD_COLUMNS}
+            FROM bank_cards
+            ORDER BY created_at DESC
+        '''
+
+# Only what the card list shows (plus the sort keysets); secrets are never read
+LIST_COLUMNS = '''id, bank_name, branch_name, account_display, atm_display, card_type,
+                   card_network, family_member, validity_end, created_at, expires_on'''
+
+ADD_DISPLAY_COLUMNS_SQL = [
+    "ALTER TABLE bank_cards ADD COLUMN account_display TEXT NOT NULL DEFAULT ''",
+    "ALTER TABLE bank_cards ADD COLUMN atm_display TEXT NOT NULL DEFAULT ''",
+]
+
+BACKFILL_DISPLAY_COLUMNS_SQL = f'''
+            UPDATE bank_cards
+            SET account_display = {MASK_CARD_NUMBER_SQL.format(column='account_number')},
+                atm_display = {MASK_CARD_NUMBER_SQL.format(column='atm_number')}
+        '''
+
+# Listing filters: name -> WHERE clause; the order here fixes the generated
+# SQL text so identical filter combinations share a cached statement
+CARD_FILTERS = {
+    'family_member': 'family_member = ?',
+    'bank_name': 'bank_name = ?',
+    'card_type': 'card_type = ?',
+    'card_network': 'card_network = ?',
+    'expiry_from': 'expires_on >= ?',
+    'expiry_to': 'expires_on <= ?',
+}
+
+# Columns broken down by get_card_stats(); card_counts keeps a row per value
+STATS_COLUMNS = ['card_type', 'card_network', 'bank_name', 'family_member']
+
+# Headings for each STATS_COLUMNS breakdown in the export summary and dashboard
+STATS_LABELS = {
+    'card_type': 'Card Types',
+    'card_network': 'Card Networks',
+    'bank_name': 'Banks',
+    'family_member': 'Family Members',
+}
+
+# Bumped whenever _migrate_schema() gains a step; stored in PRAGMA user_version
+SCHEMA_VERSION = 7
+
+# Secondary indexes matching the listing order and each equality filter
+CARD_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_bank_cards_created ON bank_cards (created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_bank_cards_member ON bank_cards (family_member, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_bank_cards_bank ON bank_cards (bank_name, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_bank_cards_type ON bank_cards (card_type, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_bank_cards_network ON bank_cards (card_network, created_at, id)',
+]
+
+SELECT_CARD_BY_ID_SQL = f'''
+            SELECT {CARD_COLUMNS}
+            FROM bank_cards WHERE id = ?
+        '''
+
+INSERT_CARD_SQL = '''
+            INSERT INTO bank_cards 
+            (bank_name, branch_name, ifsc_code, account_number, atm_number, pin, 
+             validity_start, validity_end, cvv, card_type, card_network, 
+             family_member, created_at, updated_at, account_display, atm_display)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        '''
+
+# Card columns an import writes, in add_card order; the natural key is drawn from these
+CARD_VALUE_COLUMNS = [
+    'bank_name', 'branch_name', 'ifsc_code', 'account_number', 'atm_number', 'pin',
+    'validity_start', 'validity_end', 'cvv', 'card_type', 'card_network', 'family_member'
+]
+
+# Columns that identify the same card across imports; rows sharing them are upserted.
+# This is the default for new vaults: each vault stores its own key in vault_settings
+# and changes it only through CompleteDatabase.change_natural_key()
+NATURAL_KEY = ('atm_number',)
+NATURAL_KEY_INDEX = 'idx_bank_cards_natural_key'
+NATURAL_KEY_SETTING = 'natural_key'
+
+# Per-vault settings that must travel with the data
+CREATE_SETTINGS_SQL = '''
+            CREATE TABLE IF NOT EXISTS vault_settings (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            ) WITHOUT ROWID
+        '''
+
+SELECT_SETTING_SQL = 'SELECT value FROM vault_settings WHERE name = ?'
+
+SAVE_SETTING_SQL = 'INSERT OR REPLACE INTO vault_settings (name, value) VALUES (?, ?)'
+
+DELETE_SETTING_SQL = 'DELETE FROM vault_settings WHERE name = ?'
+
+# Groups of card ids still sharing a natural key, as JSON; present only while the
+# unique index is held back, so a normal open needn't look for duplicates again
+DUPLICATE_CARDS_SETTING = 'duplicate_cards'
+
+# Ids of the cards sharing each natural key value; the unique index waits until there are none
+SELECT_DUPLICATE_KEYS_SQL = '''
+            SELECT group_concat(id) FROM bank_cards
+            GROUP BY {key} HAVING COUNT(*) > 1
+        '''
+
+# Exact copies of an older card (equal in every CARD_VALUE_COLUMNS column), which can
+# be merged into it without losing anything
+SELECT_IDENTICAL_COPIES_SQL = '''
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (PARTITION BY {columns} ORDER BY id) AS copy
+                FROM bank_cards
+            ) WHERE copy > 1
+        '''
+
+# Duplicate groups, and ids per group, spelled out in a report before the rest are only counted
+DUPLICATE_REPORT_ITEMS = 10
+
+# INSERT_CARD_SQL plus an upsert clause, completed per natural key by CompleteDatabase.
+# The WHERE leaves identical rows untouched, so they count as unchanged.
+UPSERT_CARD_SQL = INSERT_CARD_SQL.rstrip() + '''
+            ON CONFLICT ({key}) DO UPDATE SET {assignments}
+            WHERE ({columns}) IS NOT ({excluded})
+        '''
+
+UPDATE_CARD_SQL = '''
+            UPDATE bank_cards 
+            SET bank_name=?, branch_name=?, ifsc_code=?, account_number=?, atm_number=?, 
+                pin=?, validity_start=?, validity_end=?, cvv=?, card_type=?, 
+                card_network=?, family_member=?, updated_at=?, account_display=?, atm_display=?
+            WHERE id=?
+        '''
+
+DELETE_CARD_SQL = 'DELETE FROM bank_cards WHERE id = ?'
+
+# Total card count from the trigger-maintained card_counts table (see CREATE_CARD_COUNTS_SQL)
+COUNT_CARDS_SQL = "SELECT COALESCE(SUM(count), 0) FROM card_counts WHERE dimension = 'total_cards'"
+
+MAX_CARD_ID_SQL = 'SELECT COALESCE(MAX(id), 0) FROM bank_cards'
+
+SELECT_CARD_IDS_AFTER_SQL = 'SELECT id FROM bank_cards WHERE id > ? ORDER BY id'
+
+# Full-text index mirroring the searchable card columns, kept in sync by triggers
+CREATE_SEARCH_INDEX_SQL = '''
+            CREATE VIRTUAL TABLE IF NOT EXISTS bank_cards_fts USING fts5(
+                bank_name, branch_name, ifsc_code, family_member,
+                content='bank_cards', content_rowid='id', prefix='2 3'
+            )
+        '''
+
+SEARCH_INDEX_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS bank_cards_fts_insert AFTER INSERT ON bank_cards BEGIN
+        INSERT INTO bank_cards_fts (rowid, bank_name, branch_name, ifsc_code, family_member)
+        VALUES (new.id, new.bank_name, new.branch_name, new.ifsc_code, new.family_member);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS bank_cards_fts_delete AFTER DELETE ON bank_cards BEGIN
+        INSERT INTO bank_cards_fts (bank_cards_fts, rowid, bank_name, branch_name, ifsc_code, family_member)
+        VALUES ('delete', old.id, old.bank_name, old.branch_name, old.ifsc_code, old.family_member);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS bank_cards_fts_update
+    AFTER UPDATE OF bank_name, branch_name, ifsc_code, family_member ON bank_cards BEGIN
+        INSERT INTO bank_cards_fts (bank_cards_fts, rowid, bank_name, branch_name, ifsc_code, family_member)
+        VALUES ('delete', old.id, old.bank_name, old.branch_name, old.ifsc_code, old.family_member);
+        INSERT INTO bank_cards_fts (rowid, bank_name, branch_name, ifsc_code, family_member)
+        VALUES (new.id, new.bank_name, new.branch_name, new.ifsc_code, new.family_member);
+    END
+    ''',
+]
+
+SEARCH_FILTER_SQL = 'id IN (SELECT rowid FROM bank_cards_fts WHERE bank_cards_fts MATCH ?)'
+
+# Used when SQLite was built without FTS5
+SEARCH_FALLBACK_SQL = '''(bank_name LIKE ? OR branch_name LIKE ? OR ifsc_code LIKE ? OR family_member LIKE ?)'''
+
+# SQLite VM steps between checks for a cancelled search
+SEARCH_PROGRESS_STEPS = 1000
+
+# Column layout shared by the Excel export and import
+EXPORT_HEADERS = [
+    "ID", "Bank Name", "Branch Name", "IFSC Code", "Account Number", 
+    "ATM Number", "PIN", "Valid From", "Valid Until", "CVV", 
+    "Card Type", "Card Network", "Family Member", "Created At", "Updated At"
+]
+
+EXPORT_COLUMN_WIDTHS_SQL = '''
+            SELECT max(length(id)), max(length(bank_name)), max(length(branch_name)),
+                   max(length(ifsc_code)), max(length(account_number)), max(length(atm_number)),
+                   max(length(pin)), max(length(validity_start)), max(length(validity_end)),
+                   max(length(cvv)), max(length(card_type)), max(length(card_network)),
+                   max(length(family_member)), max(length(created_at)), max(length(updated_at))
+            FROM bank_cards
+        '''
+
+# Card dict keys, in the column order of CARD_COLUMNS and the Excel layout
+CARD_FIELDS = [
+    'id', 'bank_name', 'branch_name', 'ifsc_code', 'account_number', 'atm_number',
+    'pin', 'validity_start', 'validity_end', 'cvv', 'card_type', 'card_network',
+    'family_member', 'created_at', 'updated_at'
+]
+
+# Change log written by triggers on bank_cards. Updates and deletes keep only the
+# card's previous natural key values in old_card, so a delta can delete or re-key
+# the card in another vault; a natural key may use any of these columns.
+CHANGE_LOG_COLUMNS = [
+    'bank_name', 'branch_name', 'ifsc_code', 'account_number', 'atm_number',
+    'validity_start', 'validity_end', 'card_type', 'card_network', 'family_member'
+]
+
+CREATE_CHANGE_LOG_SQL = [
+    '''
+    CREATE TABLE IF NOT EXISTS card_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        card_id INTEGER NOT NULL,
+        operation TEXT NOT NULL,
+        changed_at TEXT NOT NULL,
+        old_card TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS export_checkpoints (
+        name TEXT PRIMARY KEY,
+        seq INTEGER NOT NULL,
+        exported_at TEXT NOT NULL
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS card_changes_insert AFTER INSERT ON bank_cards BEGIN
+        INSERT INTO card_changes (card_id, operation, changed_at)
+        VALUES (new.id, 'insert', strftime('%Y-%m-%dT%H:%M:%f', 'now'));
+    END
+    ''',
+]
+
+# Update and delete triggers, rebuilt whenever the natural key changes;
+# {old_card} is a json_object() of the key columns
+CREATE_CHANGE_LOG_KEY_TRIGGERS_SQL = [
+    'DROP TRIGGER IF EXISTS card_changes_update',
+    'DROP TRIGGER IF EXISTS card_changes_delete',
+    '''
+    CREATE TRIGGER card_changes_update AFTER UPDATE ON bank_cards BEGIN
+        INSERT INTO card_changes (card_id, operation, changed_at, old_card)
+        VALUES (new.id, 'update', strftime('%Y-%m-%dT%H:%M:%f', 'now'), {old_card});
+    END
+    ''',
+    '''
+    CREATE TRIGGER card_changes_delete AFTER DELETE ON bank_cards BEGIN
+        INSERT INTO card_changes (card_id, operation, changed_at, old_card)
+        VALUES (old.id, 'delete', strftime('%Y-%m-%dT%H:%M:%f', 'now'), {old_card});
+    END
+    ''',
+]
+
+# Drops everything but the natural key from old_card entries logged before version 7
+TRIM_LOGGED_OLD_CARDS_SQL = 'UPDATE card_changes SET old_card = {old_card} WHERE old_card IS NOT NULL'
+
+# Cards stored before the change log existed enter it as inserts, so the first
+# delta of any checkpoint is a full copy
+SEED_CHANGE_LOG_SQL = '''
+            INSERT INTO card_changes (card_id, operation, changed_at)
+            SELECT id, 'insert', strftime('%Y-%m-%dT%H:%M:%f', 'now') FROM bank_cards ORDER BY id
+        '''
+
+# The last seq handed out, which pruning the log doesn't take back
+MAX_CHANGE_SEQ_SQL = "SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'card_changes'"
+
+# Every checkpoint has moved past these entries, so no delta needs them again
+PRUNE_CHANGE_LOG_SQL = 'DELETE FROM card_changes WHERE seq <= (SELECT MIN(seq) FROM export_checkpoints)'
+
+# Entries up to this seq may have been pruned; positions before it can't be followed
+SELECT_PRUNED_SEQ_SQL = 'SELECT COALESCE(MIN(seq), 0) FROM export_checkpoints'
+
+# Cards a write inserted or updated, by their change log entries after a known seq
+SELECT_WRITTEN_CARDS_SQL = "SELECT card_id, operation FROM card_changes WHERE seq > ? AND operation != 'delete'"
+
+SELECT_CHECKPOINT_SQL = 'SELECT seq FROM export_checkpoints WHERE name = ?'
+
+SAVE_CHECKPOINT_SQL = '''
+            INSERT INTO export_checkpoints (name, seq, exported_at) VALUES (?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET seq = excluded.seq, exported_at = excluded.exported_at
+        '''
+
+# One row per card changed in (from_seq, to_seq]: its first logged change (which
+# tells whether it existed at the checkpoint, and under which key) and its current
+# row, or NULLs if it has since been deleted
+SELECT_DELTA_SQL = f'''
+            SELECT first.operation, first.old_card, {', '.join(f'card.{field}' for field in CARD_FIELDS)}
+            FROM (
+                SELECT MIN(seq) AS seq FROM card_changes
+                WHERE seq > ? AND seq <= ?
+                GROUP BY card_id
+            ) changed
+            JOIN card_changes first ON first.seq = changed.seq
+            LEFT JOIN bank_cards card ON card.id = first.card_id
+            ORDER BY changed.seq
+        '''
+
+# Cards a delta delete names; {conditions} compares each key column to a parameter
+SELECT_CARDS_BY_KEY_SQL = 'SELECT id FROM bank_cards WHERE {conditions}'
+
+# Checkpoint used by delta exports when none is named
+DEFAULT_CHECKPOINT = 'default'
+DELTA_FILE_TYPE = 'card_delta'
+
+# validity_end is free text, so expiry is also kept as a sortable YYYY-MM-DD
+# generated column: card-face MM/YY and MM/YYYY mean the last day of that
+# month, and anything else that isn't a YYYY-MM-DD date is NULL
+EXPIRES_ON_SQL = '''CASE
+                WHEN validity_end GLOB '[0-9][0-9]/[0-9][0-9]'
+                THEN date('20' || substr(validity_end, 4, 2) || '-' || substr(validity_end, 1, 2) || '-01',
+                          '+1 month', '-1 day')
+                WHEN validity_end GLOB '[0-9][0-9]/[0-9][0-9][0-9][0-9]'
+                THEN date(substr(validity_end, 4, 4) || '-' || substr(validity_end, 1, 2) || '-01',
+                          '+1 month', '-1 day')
+                ELSE date(validity_end) END'''
+
+ADD_EXPIRES_ON_SQL = [
+    f'ALTER TABLE bank_cards ADD COLUMN expires_on TEXT GENERATED ALWAYS AS ({EXPIRES_ON_SQL}) VIRTUAL',
+    'DROP INDEX IF EXISTS idx_bank_cards_validity_end',
+    'CREATE INDEX IF NOT EXISTS idx_bank_cards_expires_on ON bank_cards (expires_on, id)',
+]
+
+SELECT_EXPIRING_SQL = f'''
+            SELECT {LIST_COLUMNS}
+            FROM bank_cards
+            WHERE expires_on BETWEEN ? AND ?
+            ORDER BY expires_on, id
+        '''
+
+SELECT_CHANGED_CARD_IDS_SQL = 'SELECT DISTINCT card_id FROM card_changes WHERE seq > ? AND seq <= ?'
+
+SELECT_CHANGED_EXPIRING_SQL = f'''
+            SELECT {LIST_COLUMNS}
+            FROM bank_cards
+            WHERE id IN ({SELECT_CHANGED_CARD_IDS_SQL})
+              AND expires_on BETWEEN ? AND ?
+        '''
+
+# Days ahead that count as "expiring soon"
+EXPIRY_ALERT_DAYS = 60
+
+# card_counts row holding the total, next to one row per STATS_COLUMNS value
+TOTAL_CARDS_DIMENSION = 'total_cards'
+
+COUNT_CARD_SQL = '''
+                INSERT INTO card_counts (dimension, value, count) VALUES ('{dimension}', {value}, 1)
+                ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;'''
+
+UNCOUNT_CARD_SQL = '''
+                UPDATE card_counts SET count = count - 1 WHERE dimension = '{dimension}' AND value = {value};
+                DELETE FROM card_counts WHERE dimension = '{dimension}' AND value = {value} AND count = 0;'''
+
+def _card_counts_statements(template, row, total=True):
+    """Trigger statements applying template to every STATS_COLUMNS value of row (and the total)"""
+    dimensions = [(TOTAL_CARDS_DIMENSION, "''")] if total else []
+    dimensions += [(column, f'{row}.{column}') for column in STATS_COLUMNS]
+    return ''.join(template.format(dimension=dimension, value=value) for dimension, value in dimensions)
+
+# Per-value card counts kept current by triggers, so stats never scan bank_cards
+CREATE_CARD_COUNTS_SQL = [
+    '''
+            CREATE TABLE IF NOT EXISTS card_counts (
+                dimension TEXT NOT NULL,
+                value TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (dimension, value)
+            ) WITHOUT ROWID
+    ''',
+    f'''
+            CREATE TRIGGER IF NOT EXISTS card_counts_insert AFTER INSERT ON bank_cards BEGIN
+                {_card_counts_statements(COUNT_CARD_SQL, 'new')}
+            END
+    ''',
+    f'''
+            CREATE TRIGGER IF NOT EXISTS card_counts_delete AFTER DELETE ON bank_cards BEGIN
+                {_card_counts_statements(UNCOUNT_CARD_SQL, 'old')}
+            END
+    ''',
+    f'''
+            CREATE TRIGGER IF NOT EXISTS card_counts_update
+            AFTER UPDATE OF {', '.join(STATS_COLUMNS)} ON bank_cards
+            WHEN ({', '.join(f'old.{column}' for column in STATS_COLUMNS)})
+                IS NOT ({', '.join(f'new.{column}' for column in STATS_COLUMNS)})
+            BEGIN
+                {_card_counts_statements(UNCOUNT_CARD_SQL, 'old', total=False)}
+                {_card_counts_statements(COUNT_CARD_SQL, 'new', total=False)}
+            END
+    ''',
+]
+
+SEED_CARD_COUNTS_SQL = f'''
+            INSERT INTO card_counts (dimension, value, count)
+            SELECT '{TOTAL_CARDS_DIMENSION}', '', COUNT(*) FROM bank_cards
+            {''.join(
+                f"UNION ALL SELECT '{column}', {column}, COUNT(*) FROM bank_cards GROUP BY {column} "
+                for column in STATS_COLUMNS
+            )}
+        '''
+
+SELECT_CARD_COUNTS_SQL = 'SELECT dimension, value, count FROM card_counts ORDER BY dimension, value'
+
+SELECT_CARD_COUNT_SQL = 'SELECT count FROM card_counts WHERE dimension = ? AND value = ?'
+
+# Sortable listing columns: listed card field -> SQL sort expression. Ties
+# break on (created_at, id), the listing order, so each sort has an index
+# (sort, created_at, id) that serves both the ORDER BY and keyset paging
+CARD_SORTS = {
+    'created_at': 'created_at',
+    'bank_name': 'bank_name',
+    'branch_name': 'branch_name',
+    'account_number': 'account_display',
+    'atm_number': 'atm_display',
+    'card_type': 'card_type',
+    'card_network': 'card_network',
+    'family_member': 'family_member',
+    'expires_on': "IFNULL(expires_on, '')",
+}
+DEFAULT_CARD_SORT = 'created_at'
+
+# Sort indexes not already covered by CARD_INDEXES
+CARD_SORT_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_bank_cards_branch ON bank_cards (branch_name, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_bank_cards_account ON bank_cards (account_display, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_bank_cards_atm ON bank_cards (atm_display, created_at, id)',
+    "CREATE INDEX IF NOT EXISTS idx_bank_cards_expiry_sort ON bank_cards (IFNULL(expires_on, ''), created_at, id)",
+]
+
+# File extension -> export/import engine (a trailing .gz means gzip-compressed)
+FILE_FORMATS = {
+    '.delta.ndjson': 'delta',
+    '.xlsx': 'excel',
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.json': 'json',
+}
+
+# Streaming text exports: write buffer size and gzip compression level
+EXPORT_BUFFER_SIZE = 1024 * 1024
+GZIP_LEVEL = 6
+
+# Rows written per transaction by the bulk import path
+IMPORT_BATCH_SIZE = 1000
+
+# Processes validating import chunks in parallel
+IMPORT_WORKERS = os.cpu_count() or 1
+
+# Rows between progress reports / cancellation checks in long jobs
+JOB_PROGRESS_ROWS = 1000
+
+# Rows fetched per round trip when iterating over every card
+CARD_FETCH_ROWS = 1000
+
+# Cards kept in CompleteDatabase's record cache
+CARD_CACHE_SIZE = 1024
+
+# Operation tracing: off unless BANK_MANAGER_TRACE=1 or switched on at runtime
+TRACE_ENV_VAR = 'BANK_MANAGER_TRACE'
+TRACE_BUFFER_SIZE = 2000
+TRACE_MAX_STATEMENTS = 50
+TRACE_SQL_LENGTH = 200
+
+# Card validation schema, compiled once by CardValidator: field -> label and
+# rules, in add_card argument order. A field's rules are checked in this
+# order and only its first failure is reported:
+#   default     value used when the field is empty
+#   digits      keep only the digits (spaces and dashes are allowed on entry)
+#   upper       upper-case the value
+#   required    must not be empty
+#   length      (min, max) number of characters
+#   pattern     regular expression the whole value must match
+#   luhn        card number checksum
+#   date        YYYY-MM-DD date within a (first, last) range
+# Format rules (ENTRY_ONLY_RULES) apply to cards typed in through the GUI or
+# API; imports only normalize and check required fields, so cards saved
+# before the rules existed, and so a vault's own exports, always load back.
+IFSC_PATTERN = r'[A-Z]{4}0[A-Z0-9]{6}'
+CARD_DATE_RANGE = ('2000-01-01', '2099-12-31')
+
+CARD_SCHEMA = {
+    'bank_name': {'label': 'Bank name', 'required': True},
+    'branch_name': {'label': 'Branch name', 'required': True},
+    'ifsc_code': {'label': 'IFSC code', 'upper': True, 'required': True, 'pattern': IFSC_PATTERN},
+    'account_number': {'label': 'Account number', 'digits': True, 'required': True},
+    'atm_number': {'label': 'ATM number', 'digits': True, 'required': True, 'length': (16, 16), 'luhn': True},
+    'pin': {'label': 'PIN', 'required': True},
+    'validity_start': {'label': 'Valid from', 'required': True, 'date': CARD_DATE_RANGE},
+    'validity_end': {'label': 'Valid until', 'required': True, 'date': CARD_DATE_RANGE},
+    'cvv': {'label': 'CVV', 'required': True},
+    'card_type': {'label': 'Card type', 'default': 'Debit'},
+    'card_network': {'label': 'Card network', 'default': 'RuPay'},
+    'family_member': {'label': 'Family member', 'required': True},
+}
+
+# Rules validate_rows() leaves to validate(), by the names _checks() gives them
+ENTRY_ONLY_RULES = {'length', 'pattern', 'luhn', 'date_format', 'date_range'}
+
+# Doubled Luhn digit values (2d, minus 9 when that is two digits)
+LUHN_DOUBLED = str.maketrans('0123456789', '0246813579')
+
+# Shape check before the (slower) calendar check of a date field
+DATE_SHAPE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+ImportRejection = namedtuple('ImportRejection', ['row', 'field', 'rule'])
+
+# A card row with fields by name; a plain tuple, so a million of them cost a
+# fraction of the equivalent dicts
+CardRecord = namedtuple('CardRecord', CARD_FIELDS)
+
+# A card list row (LIST_COLUMNS); numbers are masked, secrets never read
+ListedCard = namedtuple('ListedCard', [
+    'id', 'bank_name', 'branch_name', 'account_number', 'atm_number', 'card_type',
+    'card_network', 'family_member', 'validity_end', 'created_at', 'expires_on'
+])
+
+# One failed rule: field and rule names plus a message for people
+CardValidationError = namedtuple('CardValidationError', ['field', 'rule', 'message'])
+
+# Card ids that entered, left or changed within the expiry window on a refresh
+ExpiryUpdate = namedtuple('ExpiryUpdate', ['entered', 'left', 'updated'])
+
+# What an import did: valid rows (inserted + updated + unchanged), rejected rows and,
+# for deltas, deleted cards
+ImportSummary = namedtuple('ImportSummary', ['imported', 'skipped', 'inserted', 'updated', 'unchanged', 'deleted'],
+                           defaults=(0,))
+
+def luhn_valid(number):
+    """Whether a digit string passes the Luhn checksum"""
+    # Every other digit from the right is doubled; summing the ASCII codes keeps the loop in C
+    digits = number[-1::-2] + number[-2::-2].translate(LUHN_DOUBLED)
+    return (sum(digits.encode()) - 48 * len(digits)) % 10 == 0
+
+def is_iso_date(value):
+    """Whether value is a real YYYY-MM-DD date"""
+    if not DATE_SHAPE.fullmatch(value):
+        return False
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+class CardValidator:
+    """Card rules compiled once from a schema, run per record or column by column
+    
+    validate() checks one card for the GUI and API; validate_rows() checks
+    a chunk of import rows one column at a time, so each rule runs as a
+    tight loop over plain strings, and skips ENTRY_ONLY_RULES.
+    """
+    
+    def __init__(self, schema=CARD_SCHEMA):
+        self.fields = list(schema)
+        self.labels = {field: rules.get('label', field) for field, rules in schema.items()}
+        self._fields = [(field, self._normalizer(rules), self._checks(field, rules))
+                        for field, rules in schema.items()]
+    
+    def _normalizer(self, rules):
+        """Compile a field's clean-up into one function of the raw value"""
+        default = rules.get('default', '')
+        if rules.get('digits'):
+            def normalize(value):
+                value = str(value or "")
+                # Most values are already bare digits
+                return (value if value.isdigit() else ''.join(filter(str.isdigit, value))) or default
+        elif rules.get('upper'):
+            def normalize(value):
+                return str(value or "").strip().upper() or default
+        else:
+            def normalize(value):
+                return str(value or "").strip() or default
+        return normalize
+    
+    def _checks(self, field, rules):
+        """Compile a field's rules into (rule, check, message) triples, cheapest first"""
+        label = self.labels[field]
+        checks = []
+        if rules.get('required'):
+            checks.append(('required', bool, f"{label} is required"))
+        if 'length' in rules:
+            shortest, longest = rules['length']
+            size = f"exactly {shortest}" if shortest == longest else f"{shortest} to {longest}"
+            checks.append(('length', lambda value: shortest <= len(value) <= longest,
+                           f"{label} must be {size} {'digits' if rules.get('digits') else 'characters'} long"))
+        if 'pattern' in rules:
+            checks.append(('pattern', re.compile(rules['pattern']).fullmatch, f"{label} is not in the expected format"))
+        if rules.get('luhn'):
+            checks.append(('luhn', luhn_valid, f"{label} is not a valid card number (checksum)"))
+        if 'date' in rules:
+            first, last = rules['date']
+            checks.append(('date_format', is_iso_date, f"{label} must be a date in YYYY-MM-DD format"))
+            checks.append(('date_range', lambda value: first <= value <= last,
+                           f"{label} must be between {first} and {last}"))
+        return checks
+    
+    def validate(self, card, stored=None):
+        """Normalize and check a card dict
+        
+        When editing, stored is the card as saved: fields left as they were
+        are not checked again, so cards saved under older rules stay
+        editable. Returns (normalized card, errors) where errors lists a
+        CardValidationError for each field that failed, empty when valid.
+        """
+        normalized = {}
+        errors = []
+        for field, normalize, checks in self._fields:
+            value = normalized[field] = normalize(card.get(field))
+            if stored is not None and value == normalize(stored.get(field)):
+                continue
+            for rule, check, message in checks:
+                if not check(value):
+                    errors.append(CardValidationError(field, rule, message))
+                    break
+        return normalized, errors
+    
+    def values(self, card):
+        """A normalized card dict as a tuple in schema (add_card argument) order"""
+        return tuple(card[field] for field in self.fields)
+    
+    def validate_rows(self, rows, first_row=1):
+        """Check rows laid out like the Excel export columns (id first), column by column
+        
+        Returns (valid card tuples in schema order, ImportRejection list).
+        """
+        width = len(self.fields) + 1
+        failed = {}
+        padded = []
+        for index, row in enumerate(rows):
+            if row is None:
+                failed[index] = (None, 'unreadable')
+                row = ()
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+            padded.append(row)
+        if not padded:
+            return [], []
+        
+        columns = {}
+        raw_columns = itertools.islice(zip(*padded), 1, width)
+        for (field, normalize, checks), raw in zip(self._fields, raw_columns):
+            values = columns[field] = list(map(normalize, raw))
+            for rule, check, _ in checks:
+                if rule in ENTRY_ONLY_RULES:
+                    continue
+                passed = list(map(check, values))
+                if all(passed):
+                    continue
+                # Earlier fields and rules win, so a row keeps its first failure
+                for index, ok in enumerate(passed):
+                    if not ok:
+                        failed.setdefault(index, (field, rule))
+        
+        cards = [card for index, card in enumerate(zip(*columns.values())) if index not in failed]
+        rejections = [ImportRejection(first_row + index, *failed[index]) for index in sorted(failed)]
+        return cards, rejections
+
+# Compiled once per process (import workers included)
+CARD_VALIDATOR = CardValidator()
+
+def validate_import_chunk(rows, first_row):
+    """Validate a chunk of imported rows; runs in import worker processes
+    
+    Returns (valid card field tuples, ImportRejection list).
+    """
+    return CARD_VALIDATOR.validate_rows(rows, first_row)
+
+class JobCancelled(Exception):
+    """Raised inside a long-running job once its caller asks it to stop"""
+
+class DuplicateCardError(ValueError):
+    """Raised when a write would give two cards the same natural key"""
+
+class StartupTimer:
+    """Wall-clock phases of a startup, printed as a breakdown"""
+    
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self._last = self.started
+        self.phases = []
+    
+    def mark(self, phase):
+        """End the phase that ran since the previous mark"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+    
+    def restart(self):
+        """Drop the recorded phases and start timing from now"""
+        self.started = self._last = time.perf_counter()
+        self.phases = []
+    
+    def report(self, title="Startup"):
+        """Phases and their total in milliseconds, one per line"""
+        width = max([len(phase) for phase, _ in self.phases] + [len(title)])
+        lines = [f"{title}:"]
+        for phase, seconds in self.phases:
+            lines.append(f"  {phase:<{width}}  {seconds * 1000:8.1f} ms")
+        total = sum(seconds for _, seconds in self.phases)
+        lines.append(f"  {'total':<{width}}  {total * 1000:8.1f} ms")
+        return '\n'.join(lines)
+
+class Tracer:
+    """Opt-in ring buffer of operation spans with their SQL timings"""
+    
+    def __init__(self, enabled=False, buffer_size=TRACE_BUFFER_SIZE):
+        self.enabled = enabled
+        self._spans = deque(maxlen=buffer_size)
+        self._spans_lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.perf_counter()
+    
+    def current(self):
+        """The innermost open span on this thread, or None"""
+        stack = getattr(self._local, 'stack', None)
+        return stack[-1] if stack else None
+    
+    @contextmanager
+    def span(self, name):
+        """Record the block as one span; nested spans keep their own SQL"""
+        if not self.enabled:
+            yield None
+            return
+        
+        stack = self._local.__dict__.setdefault('stack', [])
+        started = time.perf_counter()
+        span = {
+            'name': name,
+            'thread': threading.get_ident(),
+            'depth': len(stack),
+            'start': started - self._origin,
+            'duration': 0.0,
+            'acquire': 0.0,
+            'execute': 0.0,
+            'commit': 0.0,
+            'rows': 0,
+            'statements': [],
+            'dropped_statements': 0,
+            'error': None
+        }
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as error:
+            span['error'] = type(error).__name__
+            raise
+        finally:
+            span['duration'] = time.perf_counter() - started
+            stack.pop()
+            with self._spans_lock:
+                self._spans.append(span)
+    
+    def record_acquire(self, seconds):
+        """Add time spent waiting for a connection to the current span"""
+        span = self.current()
+        if span is not None:
+            span['acquire'] += seconds
+    
+    def record_commit(self, seconds):
+        """Add time spent committing to the current span"""
+        span = self.current()
+        if span is not None:
+            span['commit'] += seconds
+    
+    def wrap(self, conn):
+        """Return conn, or a timing proxy for it while a span is open"""
+        span = self.current() if self.enabled else None
+        if span is None:
+            return conn
+        return TracedConnection(conn, span, self._origin)
+    
+    def spans(self):
+        """Finished spans, oldest first"""
+        with self._spans_lock:
+            return list(self._spans)
+    
+    def clear(self):
+        """Drop every recorded span"""
+        with self._spans_lock:
+            self._spans.clear()
+    
+    def latency_stats(self):
+        """Per-operation call count and p50/p95/p99/max latency in milliseconds"""
+        durations = {}
+        for span in self.spans():
+            durations.setdefault(span['name'], []).append(span['duration'] * 1000)
+        
+        stats = {}
+        for name, values in durations.items():
+            values.sort()
+            stats[name] = {
+                'count': len(values),
+                'p50': self._percentile(values, 50),
+                'p95': self._percentile(values, 95),
+                'p99': self._percentile(values, 99),
+                'max': values[-1]
+            }
+        return stats
+    
+    @staticmethod
+    def _percentile(values, percent):
+        """Nearest-rank percentile of an already sorted list"""
+        rank = max(1, -(-len(values) * percent // 100))
+        return values[rank - 1]
+    
+    def dump(self, filename, trace_format='chrome'):
+        """Write the recorded spans as a Chrome trace (chrome://tracing, Perfetto) or plain JSON"""
+        spans = self.spans()
+        if trace_format == 'json':
+            document = {'spans': spans}
+        elif trace_format == 'chrome':
+            document = {'traceEvents': self._chrome_events(spans), 'displayTimeUnit': 'ms'}
+        else:
+            raise ValueError(f"Unknown trace format: {trace_format}")
+        
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=1)
+        return len(spans)
+    
+    def _chrome_events(self, spans):
+        """Complete ('X') events for each span and the statements it ran"""
+        pid = os.getpid()
+        events = []
+        for span in spans:
+            events.append({
+                'name': span['name'],
+                'cat': 'operation',
+                'ph': 'X',
+                'pid': pid,
+                'tid': span['thread'],
+                'ts': span['start'] * 1e6,
+                'dur': span['duration'] * 1e6,
+                'args': {
+                    'acquire_ms': span['acquire'] * 1000,
+                    'execute_ms': span['execute'] * 1000,
+                    'commit_ms': span['commit'] * 1000,
+                    'rows': span['rows'],
+                    'dropped_statements': span['dropped_statements'],
+                    'error': span['error']
+                }
+            })
+            for statement in span['statements']:
+                events.append({
+                    'name': statement['sql'].split(None, 1)[0].upper(),
+                    'cat': 'sql',
+                    'ph': 'X',
+                    'pid': pid,
+                    'tid': span['thread'],
+                    'ts': statement['start'] * 1e6,
+                    'dur': statement['duration'] * 1e6,
+                    'args': {'sql': statement['sql'], 'rows': statement['rows']}
+                })
+        return events
+
+class TracedCursor:
+    """Cursor proxy that adds statement time and row counts to a trace span"""
+    
+    def __init__(self, cursor, span, origin):
+        self._cursor = cursor
+        self._span = span
+        self._origin = origin
+        self._statement = None
+    
+    def _record(self, sql, started, rows):
+        """Start a new statement record once execute() returns"""
+        seconds = time.perf_counter() - started
+        self._span['execute'] += seconds
+        self._span['rows'] += rows
+        
+        if len(self._span['statements']) >= TRACE_MAX_STATEMENTS:
+            self._span['dropped_statements'] += 1
+            self._statement = None
+            return
+        self._statement = {
+            'sql': ' '.join(sql.split())[:TRACE_SQL_LENGTH],
+            'start': started - self._origin,
+            'duration': seconds,
+            'rows': rows
+        }
+        self._span['statements'].append(self._statement)
+    
+    def _fetched(self, started, rows):
+        """Charge fetch time and returned rows to the last statement"""
+        seconds = time.perf_counter() - started
+        self._span['execute'] += seconds
+        self._span['rows'] += rows
+        if self._statement is not None:
+            self._statement['duration'] += seconds
+            self._statement['rows'] += rows
+    
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        self._cursor.execute(sql, parameters)
+        self._record(sql, started, max(self._cursor.rowcount, 0))
+        return self
+    
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        self._cursor.executemany(sql, seq_of_parameters)
+        self._record(sql, started, max(self._cursor.rowcount, 0))
+        return self
+    
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(started, 0 if row is None else 1)
+        return row
+    
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(self._cursor.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+    
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(started, len(rows))
+        return rows
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = next(self._cursor)
+        except StopIteration:
+            self._fetched(started, 0)
+            raise
+        self._fetched(started, 1)
+        return row
+    
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class TracedConnection:
+    """Connection proxy whose statements are timed into a trace span"""
+    
+    def __init__(self, conn, span, origin):
+        self._conn = conn
+        self._span = span
+        self._origin = origin
+    
+    def cursor(self):
+        return TracedCursor(self._conn.cursor(), self._span, self._origin)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+def traced(method):
+    """Record each call of a CompleteDatabase method as a span when tracing is on"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.tracer.enabled:
+            return method(self, *args, **kwargs)
+        with self.tracer.span(method.__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class ConnectionManager:
+    """Long-lived SQLite connections: one writer plus a small pool of readers"""
+    
+    def __init__(self, db_path, read_pool_size=4, statement_cache_size=128, tracer=None):
+        self.db_path = db_path
+        self.read_pool_size = read_pool_size
+        self.statement_cache_size = statement_cache_size
+        self.tracer = tracer or Tracer()
+        
+        # Single writer, serialized by a re-entrant lock so transactions can nest
+        self._write_lock = threading.RLock()
+        self._write_conn = self._connect()
+        self._commit_callbacks = []
+        
+        # Readers are created lazily up to the pool size
+        self._read_pool = queue.LifoQueue()
+        self._read_count = 0
+        self._pool_lock = threading.Lock()
+        self._closed = False
+    
+    def _connect(self, read_only=False):
+        """Open a connection configured for WAL mode"""
+        conn = sqlite3.connect(
+            self.db_path,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        if read_only:
+            conn.execute('PRAGMA query_only=ON')
+        return conn
+    
+    def _acquire_reader(self):
+        """Take a reader from the pool, opening a new one if allowed"""
+        try:
+            return self._read_pool.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._pool_lock:
+            if self._read_count < self.read_pool_size:
+                self._read_count += 1
+                return self._connect(read_only=True)
+        
+        return self._read_pool.get()
+    
+    @contextmanager
+    def read(self, cancelled=None):
+        """Borrow a read-only connection for the duration of the block
+        
+        cancelled is an optional callable polled while statements run; once it
+        returns True the running statement fails with sqlite3.OperationalError.
+        """
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection manager is closed")
+        started = time.perf_counter()
+        conn = self._acquire_reader()
+        self.tracer.record_acquire(time.perf_counter() - started)
+        if cancelled is not None:
+            conn.set_progress_handler(lambda: 1 if cancelled() else 0, SEARCH_PROGRESS_STEPS)
+        try:
+            yield self.tracer.wrap(conn)
+        finally:
+            if cancelled is not None:
+                conn.set_progress_handler(None, 0)
+            self._read_pool.put(conn)
+    
+    @contextmanager
+    def transaction(self):
+        """Run the block inside a write transaction, committing on success"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection manager is closed")
+        started = time.perf_counter()
+        with self._write_lock:
+            conn = self._write_conn
+            
+            # Nested use joins the outer transaction
+            if conn.in_transaction:
+                yield self.tracer.wrap(conn)
+                return
+            
+            self._commit_callbacks = []
+            conn.execute('BEGIN IMMEDIATE')
+            self.tracer.record_acquire(time.perf_counter() - started)
+            try:
+                yield self.tracer.wrap(conn)
+            except BaseException:
+                conn.rollback()
+                self._commit_callbacks = []
+                raise
+            started = time.perf_counter()
+            conn.commit()
+            self.tracer.record_commit(time.perf_counter() - started)
+            
+            callbacks, self._commit_callbacks = self._commit_callbacks, []
+            for callback in callbacks:
+                callback()
+    
+    def on_commit(self, callback):
+        """Run callback after the enclosing outermost transaction commits
+        
+        Callbacks are discarded if the transaction rolls back.
+        """
+        self._commit_callbacks.append(callback)
+    
+    @contextmanager
+    def snapshot(self):
+        """Borrow a reader inside one read transaction, so every query sees the same data"""
+        with self.read() as conn:
+            conn.execute('BEGIN')
+            try:
+                yield conn
+            finally:
+                conn.rollback()
+    
+    def data_version(self):
+        """PRAGMA data_version as seen by the writer, or None if the writer is busy
+        
+        The value changes whenever another connection (or process) commits,
+        but not for commits made through this manager's writer.
+        """
+        if not self._write_lock.acquire(blocking=False):
+            return None
+        try:
+            if self._closed:
+                return None
+            return self._write_conn.execute('PRAGMA data_version').fetchone()[0]
+        finally:
+            self._write_lock.release()
+    
+    def close(self):
+        """Close the writer and every pooled reader"""
+        with self._write_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._write_conn.close()
+        
+        while True:
+            try:
+                self._read_pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+class CardChanges:
+    """Card ids inserted, updated or deleted since the changes were last taken"""
+    
+    def __init__(self):
+        self.inserted = set()
+        self.updated = set()
+        self.deleted = set()
+    
+    def __bool__(self):
+        return bool(self.inserted or self.updated or self.deleted)
+    
+    def record_inserted(self, card_ids):
+        """Record newly inserted cards"""
+        self.inserted.update(card_ids)
+    
+    def record_updated(self, card_ids):
+        """Record updated cards; updates to unseen inserts stay inserts"""
+        self.updated.update(card_id for card_id in card_ids if card_id not in self.inserted)
+    
+    def record_deleted(self, card_ids):
+        """Record deleted cards; deleting an unseen insert cancels it out"""
+        for card_id in card_ids:
+            if card_id in self.inserted:
+                self.inserted.discard(card_id)
+            else:
+                self.updated.discard(card_id)
+                self.deleted.add(card_id)
+
+class ExpiryWatch:
+    """Cards expiring within a window of days, kept current incrementally
+    
+    The first refresh loads the window; later refreshes only look at cards
+    in the change log since the last one and, when the date rolls over, at
+    the day that entered the window, so a tick costs the same however large
+    the vault is.
+    """
+    
+    def __init__(self, database, days=EXPIRY_ALERT_DAYS):
+        self.database = database
+        self.days = days
+        self.cards = {}
+        self.seq = None
+        self.start = None
+        self.end = None
+    
+    def refresh(self, today=None):
+        """Bring the window up to date and return an ExpiryUpdate"""
+        today = today or date.today()
+        start = today.isoformat()
+        end = (today + timedelta(days=self.days)).isoformat()
+        
+        changes = None
+        if self.seq is not None:
+            entering_from = None
+            if end > self.end:
+                entering_from = (date.fromisoformat(self.end) + timedelta(days=1)).isoformat()
+            changes = self.database.get_expiry_changes(self.seq, start, end, entering_from)
+        
+        before = set(self.cards)
+        if changes is None:
+            # First refresh, or the change log was pruned since the last one
+            self.seq, cards = self.database.get_expiry_window(start, end)
+            self.cards = {card.id: card for card in cards}
+            self.start, self.end = start, end
+            after = set(self.cards)
+            return ExpiryUpdate(after - before, before - after, before & after)
+        
+        self.seq, changed_ids, cards = changes
+        for card_id in changed_ids:
+            self.cards.pop(card_id, None)
+        if start > self.start:
+            for card_id in [card_id for card_id, card in self.cards.items() if card.expires_on < start]:
+                del self.cards[card_id]
+        for card in cards:
+            self.cards[card.id] = card
+        self.start, self.end = start, end
+        
+        after = set(self.cards)
+        return ExpiryUpdate(after - before, before - after, changed_ids & before & after)
+    
+    def expiring_cards(self):
+        """Cards in the window, soonest first"""
+        return sorted(self.cards.values(), key=lambda card: (card.expires_on, card.id))
+
+class CardCache:
+    """Bounded LRU of unmasked card records keyed by card id"""
+    
+    def __init__(self, max_size=CARD_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # Bumped on every invalidation so reads that raced a write are not cached
+        self.generation = 0
+        self._cards = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, card_id):
+        """Return the cached card or None, counting the hit or miss"""
+        with self._lock:
+            card = self._cards.get(card_id)
+            if card is None:
+                self.misses += 1
+                return None
+            self._cards.move_to_end(card_id)
+            self.hits += 1
+            return card
+    
+    def put(self, card_id, card, generation):
+        """Cache a card read while the cache was at the given generation"""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._cards[card_id] = card
+            self._cards.move_to_end(card_id)
+            while len(self._cards) > self.max_size:
+                self._cards.popitem(last=False)
+    
+    def invalidate(self, card_ids):
+        """Drop specific cards"""
+        with self._lock:
+            self.generation += 1
+            for card_id in card_ids:
+                self._cards.pop(card_id, None)
+    
+    def clear(self):
+        """Drop every card"""
+        with self._lock:
+            self.generation += 1
+            self._cards.clear()
+    
+    def stats(self):
+        """Counters for diagnostics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._cards),
+                'max_size': self.max_size
+            }
+
+class CompleteDatabase:
+    """Complete database with all features"""
+    
+    def __init__(self, master_password, db_path='complete_bank_manager.db', trace=None,
+                 startup_timer=None, read_pool_size=4, track_changes=False):
+        self.master_password = master_password
+        self.db_path = db_path
+        self.startup_timer = startup_timer or StartupTimer()
+        if trace is None:
+            trace = os.environ.get(TRACE_ENV_VAR, '') not in ('', '0')
+        self.tracer = Tracer(enabled=trace)
+        self.connections = ConnectionManager(self.db_path, read_pool_size, tracer=self.tracer)
+        self.startup_timer.mark('open vault connection')
+        # Only a caller that drains take_changes() should collect ids; others would leak them
+        self.track_changes = track_changes
+        self._changes = CardChanges()
+        self._changes_lock = threading.Lock()
+        self.card_cache = CardCache()
+        self._cache_version = None
+        self._init_database()
+    
+    def take_changes(self):
+        """Return the card ids changed by writes since the last call and reset them
+        
+        Always empty unless the database was opened with track_changes=True.
+        """
+        with self._changes_lock:
+            changes, self._changes = self._changes, CardChanges()
+        return changes
+    
+    def _record_changes(self, inserted=(), updated=(), deleted=()):
+        """Uncache the card ids a write touched, and remember them if tracking, once it commits
+        
+        Must be called inside connections.transaction().
+        """
+        def record():
+            self.card_cache.invalidate(updated)
+            self.card_cache.invalidate(deleted)
+            if not self.track_changes:
+                return
+            with self._changes_lock:
+                self._changes.record_inserted(inserted)
+                self._changes.record_updated(updated)
+                self._changes.record_deleted(deleted)
+        
+        self.connections.on_commit(record)
+    
+    def close(self):
+        """Release all database connections"""
+        self.connections.close()
+    
+    def _init_database(self):
+        """Bring the schema up to date, skipping all DDL when user_version is current"""
+        with self.connections.read() as conn:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            natural_key = self._stored_natural_key(conn) if version >= 6 else None
+            pending = self._stored_duplicates(conn) if version >= 6 else None
+            indexed_key = self._natural_key_columns(conn)
+        
+        # Cards that share a natural key are reported, never removed
+        self.duplicate_cards = pending or []
+        if version < SCHEMA_VERSION or (indexed_key != natural_key and pending is None):
+            with self.connections.transaction() as conn:
+                # Another process may have migrated while we waited for the lock
+                version = conn.execute('PRAGMA user_version').fetchone()[0]
+                if version < SCHEMA_VERSION:
+                    self._migrate_schema(conn, version)
+                    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+                self._set_natural_key(self._stored_natural_key(conn))
+                pending = self._stored_duplicates(conn)
+                if pending is not None:
+                    self.duplicate_cards = pending
+                elif self._natural_key_columns(conn) != self.natural_key:
+                    self.duplicate_cards = self._index_natural_key(conn)
+            self.startup_timer.mark('migrate schema')
+        else:
+            self._set_natural_key(natural_key)
+            self.startup_timer.mark('check schema version')
+        
+        with self.connections.read() as conn:
+            self.search_enabled = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'bank_cards_fts'"
+            ).fetchone() is not None
+        self.startup_timer.mark('detect search index')
+    
+    def _migrate_schema(self, conn, version):
+        """Create or upgrade the schema from user_version to SCHEMA_VERSION
+        
+        Version 0 covers both new vaults and vaults created before the schema
+        was versioned, so its statements must be idempotent.
+        """
+        if version < 1:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS bank_cards (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                bank_name TEXT NOT NULL,
+                branch_name TEXT NOT NULL,
+                ifsc_code TEXT NOT NULL,
+                account_number TEXT NOT NULL,
+                atm_number TEXT NOT NULL,
+                pin TEXT NOT NULL,
+                validity_start TEXT NOT NULL,
+                validity_end TEXT NOT NULL,
+                cvv TEXT NOT NULL,
+                card_type TEXT NOT NULL,
+                card_network TEXT NOT NULL,
+                family_member TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                account_display TEXT NOT NULL DEFAULT '',
+                atm_display TEXT NOT NULL DEFAULT ''
+            )
+            ''')
+            
+            # Vaults created before the display columns existed
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(bank_cards)')}
+            if 'atm_display' not in columns:
+                for alter_sql in ADD_DISPLAY_COLUMNS_SQL:
+                    conn.execute(alter_sql)
+                conn.execute(BACKFILL_DISPLAY_COLUMNS_SQL)
+            
+            for index_sql in CARD_INDEXES:
+                conn.execute(index_sql)
+            
+            self._init_search_index(conn)
+        
+        if version < 2:
+            for change_log_sql in CREATE_CHANGE_LOG_SQL:
+                conn.execute(change_log_sql)
+            conn.execute(SEED_CHANGE_LOG_SQL)
+        
+        if version < 3:
+            for expires_on_sql in ADD_EXPIRES_ON_SQL:
+                conn.execute(expires_on_sql)
+        
+        if version < 4:
+            for card_counts_sql in CREATE_CARD_COUNTS_SQL:
+                conn.execute(card_counts_sql)
+            conn.execute(SEED_CARD_COUNTS_SQL)
+        
+        if version < 5:
+            for index_sql in CARD_SORT_INDEXES:
+                conn.execute(index_sql)
+        
+        if version < 6:
+            conn.execute(CREATE_SETTINGS_SQL)
+            # Keep the key an existing unique index was built on
+            natural_key = self._natural_key_columns(conn) or NATURAL_KEY
+            conn.execute(SAVE_SETTING_SQL, (NATURAL_KEY_SETTING, ','.join(natural_key)))
+        
+        if version < 7:
+            natural_key = self._stored_natural_key(conn)
+            self._create_change_log_triggers(conn, natural_key)
+            old_card = 'json_object({})'.format(', '.join(
+                f"'{column}', json_extract(old_card, '$.{column}')" for column in natural_key
+            ))
+            conn.execute(TRIM_LOGGED_OLD_CARDS_SQL.format(old_card=old_card))
+    
+    def _create_change_log_triggers(self, conn, natural_key):
+        """(Re)create the update and delete triggers logging natural_key in old_card"""
+        old_card = 'json_object({})'.format(', '.join(f"'{column}', old.{column}" for column in natural_key))
+        for trigger_sql in CREATE_CHANGE_LOG_KEY_TRIGGERS_SQL:
+            conn.execute(trigger_sql.format(old_card=old_card))
+    
+    def _natural_key_columns(self, conn):
+        """Columns of the vault's unique natural key index, or () if it has none"""
+        return tuple(row[2] for row in conn.execute(f'PRAGMA index_info({NATURAL_KEY_INDEX})'))
+    
+    def _stored_natural_key(self, conn):
+        """The natural key columns saved in vault_settings"""
+        row = conn.execute(SELECT_SETTING_SQL, (NATURAL_KEY_SETTING,)).fetchone()
+        return tuple(row[0].split(','))
+    
+    def _stored_duplicates(self, conn):
+        """Duplicate groups saved while the natural key index is held back, or None"""
+        row = conn.execute(SELECT_SETTING_SQL, (DUPLICATE_CARDS_SETTING,)).fetchone()
+        return [tuple(group) for group in json.loads(row[0])] if row else None
+    
+    def _set_natural_key(self, natural_key):
+        """Use natural_key for upserts and delta matching"""
+        unknown = set(natural_key) - set(CHANGE_LOG_COLUMNS)
+        if unknown or not natural_key:
+            raise ValueError(f"Invalid natural key: {', '.join(natural_key)}")
+        self.natural_key = tuple(natural_key)
+        self._upsert_sql = self._build_upsert_sql()
+    
+    def _index_natural_key(self, conn):
+        """Build the unique index on self.natural_key unless cards share a key
+        
+        Exact copies are merged into the oldest card first, since nothing is
+        lost. Returns the sorted groups of card ids that still share a key
+        value (also saved in vault_settings); the index exists only when that
+        is empty. Cards that differ are never removed to make the index fit.
+        """
+        key = ', '.join(self.natural_key)
+        conn.execute(f'DROP INDEX IF EXISTS {NATURAL_KEY_INDEX}')
+        duplicates = self._duplicate_groups(conn)
+        if duplicates:
+            copies = conn.execute(SELECT_IDENTICAL_COPIES_SQL.format(columns=', '.join(CARD_VALUE_COLUMNS)))
+            copies = [row[0] for row in copies]
+            conn.executemany(DELETE_CARD_SQL, [(card_id,) for card_id in copies])
+            self._record_changes(deleted=copies)
+            duplicates = self._duplicate_groups(conn)
+        
+        if duplicates:
+            conn.execute(SAVE_SETTING_SQL, (DUPLICATE_CARDS_SETTING, json.dumps(duplicates)))
+        else:
+            conn.execute(DELETE_SETTING_SQL, (DUPLICATE_CARDS_SETTING,))
+            conn.execute(f'CREATE UNIQUE INDEX {NATURAL_KEY_INDEX} ON bank_cards ({key})')
+        return duplicates
+    
+    def _duplicate_groups(self, conn):
+        """Sorted groups of card ids sharing a value of self.natural_key"""
+        key = ', '.join(self.natural_key)
+        return sorted(
+            tuple(sorted(int(card_id) for card_id in ids.split(',')))
+            for (ids,) in conn.execute(SELECT_DUPLICATE_KEYS_SQL.format(key=key))
+        )
+    
+    def _retry_natural_key_index(self, conn):
+        """Try again to build the index held back by duplicates; returns the groups left
+        
+        Must be called inside connections.transaction(); duplicate_cards
+        follows once it commits.
+        """
+        duplicates = self._index_natural_key(conn)
+        self.connections.on_commit(lambda: setattr(self, 'duplicate_cards', duplicates))
+        return duplicates
+    
+    def duplicate_cards_message(self, duplicates=None):
+        """Describe groups of cards sharing a natural key, for people to resolve"""
+        duplicates = self.duplicate_cards if duplicates is None else duplicates
+        fields = ', '.join(name.replace('_', ' ') for name in self.natural_key)
+        groups = '; '.join(
+            ', '.join(map(str, group[:DUPLICATE_REPORT_ITEMS]))
+            + (f" and {len(group) - DUPLICATE_REPORT_ITEMS} more" if len(group) > DUPLICATE_REPORT_ITEMS else '')
+            for group in duplicates[:DUPLICATE_REPORT_ITEMS]
+        )
+        if len(duplicates) > DUPLICATE_REPORT_ITEMS:
+            groups += f"; and {len(duplicates) - DUPLICATE_REPORT_ITEMS} more groups"
+        return f"Cards sharing the same {fields} (by id): {groups}"
+    
+    @traced
+    def change_natural_key(self, natural_key):
+        """Match cards on other columns from now on, rebuilding the unique index
+        
+        Raises DuplicateCardError, changing nothing, when existing cards
+        share a value of the new key.
+        """
+        previous = self.natural_key
+        with self.connections.transaction() as conn:
+            self._set_natural_key(natural_key)
+            duplicates = self._index_natural_key(conn)
+            if duplicates:
+                message = self.duplicate_cards_message(duplicates)
+                self._set_natural_key(previous)
+                raise DuplicateCardError(message)
+            conn.execute(SAVE_SETTING_SQL, (NATURAL_KEY_SETTING, ','.join(self.natural_key)))
+            self._create_change_log_triggers(conn, self.natural_key)
+        self.duplicate_cards = []
+    
+    def _build_upsert_sql(self):
+        """UPSERT_CARD_SQL for self.natural_key"""
+        key = ', '.join(self.natural_key)
+        compared = [column for column in CARD_VALUE_COLUMNS if column not in self.natural_key]
+        if not compared:
+            return f"{INSERT_CARD_SQL.rstrip()} ON CONFLICT ({key}) DO NOTHING"
+        
+        assigned = compared + ['updated_at', 'account_display', 'atm_display']
+        return UPSERT_CARD_SQL.format(
+            key=key,
+            assignments=', '.join(f'{column} = excluded.{column}' for column in assigned),
+            columns=', '.join(f'bank_cards.{column}' for column in compared),
+            excluded=', '.join(f'excluded.{column}' for column in compared)
+        )
+    
+    def _init_search_index(self, conn):
+        """Create the FTS5 search index and its triggers, if SQLite supports FTS5"""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'bank_cards_fts'"
+        ).fetchone()
+        
+        try:
+            conn.execute(CREATE_SEARCH_INDEX_SQL)
+        except sqlite3.OperationalError:
+            return False
+        
+        for trigger_sql in SEARCH_INDEX_TRIGGERS:
+            conn.execute(trigger_sql)
+        
+        # Index cards that were stored before the search index existed
+        if not exists:
+            conn.execute("INSERT INTO bank_cards_fts (bank_cards_fts) VALUES ('rebuild')")
+        return True
+    
+    def mask_card_number(self, card_number):
+        """Mask card number"""
+        if len(card_number) >= 16:
+            return f"{card_number[:4]} **** **** {card_number[-4:]}"
+        return "**** **** **** ****"
+    
+    def mask_cvv(self, cvv):
+        """Mask CVV"""
+        if len(cvv) == 3:
+            return "***"
+        return "**"
+    
+    @contextmanager
+    def _unique_cards(self):
+        """Turn natural key violations in the block into DuplicateCardError"""
+        try:
+            yield
+        except sqlite3.IntegrityError as e:
+            if 'UNIQUE' not in str(e):
+                raise
+            fields = ', '.join(name.replace('_', ' ') for name in self.natural_key)
+            raise DuplicateCardError(f"Another card already has this {fields}") from e
+    
+    @traced
+    def add_card(self, bank_name, branch_name, ifsc_code, account_number, atm_number, pin, 
+                 validity_start, validity_end, cvv, card_type, card_network, family_member):
+        """Add new bank card"""
+        now = datetime.now().isoformat()
+        
+        with self._unique_cards(), self.connections.transaction() as conn:
+            cursor = conn.execute(INSERT_CARD_SQL, (
+                bank_name, branch_name, ifsc_code, account_number, atm_number, pin, 
+                validity_start, validity_end, cvv, card_type, card_network, 
+                family_member, now, now,
+                self.mask_card_number(account_number), self.mask_card_number(atm_number)
+            ))
+            card_id = cursor.lastrowid
+            self._record_changes(inserted=[card_id])
+        
+        return card_id
+    
+    @traced
+    def get_all_cards(self):
+        """Get all cards with masked sensitive data
+        
+        Returns a list of card dicts; iter_cards() streams compact CardRecords instead.
+        """
+        return [card._asdict() for card in self.iter_cards()]
+    
+    def iter_cards(self, masked=True):
+        """Yield every card as a CardRecord, newest first, from one snapshot
+        
+        Rows are fetched CARD_FETCH_ROWS at a time, so memory use does not grow
+        with the vault. The snapshot's reader is held until the generator is
+        exhausted or closed.
+        """
+        with self.connections.snapshot() as conn:
+            yield from self._iter_records(conn, SELECT_ALL_MASKED_CARDS_SQL if masked else SELECT_ALL_CARDS_SQL)
+    
+    def _iter_records(self, conn, sql, params=(), record=CardRecord):
+        """Yield the rows of a query as records, fetched in CARD_FETCH_ROWS blocks"""
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(CARD_FETCH_ROWS)
+            if not rows:
+                return
+            yield from map(record._make, rows)
+    
+    def _filter_clauses(self, filters):
+        """Build WHERE clauses and parameters for a filters dict
+        
+        Besides the CARD_FILTERS names, 'search' takes free text matched by
+        prefix against bank, branch, IFSC and family member.
+        """
+        filters = filters or {}
+        unknown = set(filters) - set(CARD_FILTERS) - {'search'}
+        if unknown:
+            raise ValueError(f"Unknown card filter: {', '.join(sorted(unknown))}")
+        
+        clauses = []
+        params = []
+        for name, clause in CARD_FILTERS.items():
+            value = filters.get(name)
+            if value not in (None, ''):
+                clauses.append(clause)
+                params.append(value)
+        
+        terms = re.findall(r'\w+', filters.get('search') or '')
+        if terms and self.search_enabled:
+            clauses.append(SEARCH_FILTER_SQL)
+            params.append(' '.join(f'"{term}"*' for term in terms))
+        elif terms:
+            for term in terms:
+                clauses.append(SEARCH_FALLBACK_SQL)
+                params.extend([f'%{term}%'] * 4)
+        return clauses, params
+    
+    @traced
+    def count_cards(self, filters=None):
+        """Count cards matching the filters
+        
+        No filters, or a single filter on a STATS_COLUMNS column, is answered
+        from card_counts without touching bank_cards.
+        """
+        active = {name: value for name, value in (filters or {}).items() if value not in (None, '')}
+        if not active or (len(active) == 1 and set(active) <= set(STATS_COLUMNS)):
+            dimension, value = next(iter(active.items()), (TOTAL_CARDS_DIMENSION, ''))
+            with self.connections.read() as conn:
+                row = conn.execute(SELECT_CARD_COUNT_SQL, (dimension, value)).fetchone()
+            return row[0] if row else 0
+        
+        clauses, params = self._filter_clauses(filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        
+        with self.connections.read() as conn:
+            return conn.execute(f'SELECT COUNT(*) FROM bank_cards {where}', params).fetchone()[0]
+    
+    @traced
+    def query_cards(self, filters=None, after=None, limit=100, sort=DEFAULT_CARD_SORT, descending=True):
+        """Get masked cards matching the filters, one keyset page at a time
+        
+        filters maps CARD_FILTERS names (family_member, bank_name, card_type,
+        card_network, expiry_from, expiry_to) to values. Cards are ordered by
+        a CARD_SORTS column, newest first by default. after is the keyset of
+        the last card on the previous page, as returned by sort_keyset(); for
+        the default sort that is its (created_at, id). Cards are ListedCard
+        records carrying only the list view fields (LIST_COLUMNS).
+        """
+        return list(map(ListedCard._make, self._query_rows(filters, after, limit, sort, descending)))
+    
+    def iter_listed_cards(self, filters=None, sort=DEFAULT_CARD_SORT, descending=True,
+                          page_size=CARD_FETCH_ROWS):
+        """Yield every masked card matching the filters as a ListedCard, in sort order
+        
+        Walks query_cards() keyset pages of page_size rows, holding no reader
+        between pages; memory use does not grow with the number of cards.
+        """
+        after = None
+        while True:
+            rows = self._query_rows(filters, after, page_size, sort, descending)
+            yield from map(ListedCard._make, rows)
+            if len(rows) < page_size:
+                return
+            after = self.sort_keyset(ListedCard._make(rows[-1]), sort)
+    
+    def _query_rows(self, filters, after, limit, sort, descending):
+        """LIST_COLUMNS rows of one query_cards() page"""
+        keyset, order_by = self._sort_order(sort, descending)
+        clauses, params = self._filter_clauses(filters)
+        if after is not None:
+            operator = '<' if descending else '>'
+            # The leading bound alone lets SQLite seek expression indexes too
+            clauses.append(f"{keyset[0]} {operator}= ?")
+            clauses.append(f"({', '.join(keyset)}) {operator} ({', '.join('?' * len(keyset))})")
+            params.append(after[0])
+            params.extend(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        
+        with self.connections.read() as conn:
+            return conn.execute(f'''
+                SELECT {LIST_COLUMNS}
+                FROM bank_cards {where}
+                ORDER BY {order_by}
+                LIMIT ?
+            ''', params + [limit]).fetchall()
+    
+    @traced
+    def get_cards_page(self, offset, limit, after=None, filters=None, sort=DEFAULT_CARD_SORT, descending=True):
+        """Get one page of masked cards in listing order
+        
+        When after (the last card of the previous page) is given the page is
+        read by keyset, otherwise by offset for random jumps.
+        """
+        if after is not None:
+            return self.query_cards(filters, self.sort_keyset(after, sort), limit, sort, descending)
+        
+        _, order_by = self._sort_order(sort, descending)
+        clauses, params = self._filter_clauses(filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        
+        with self.connections.read() as conn:
+            rows = conn.execute(f'''
+                SELECT {LIST_COLUMNS}
+                FROM bank_cards {where}
+                ORDER BY {order_by}
+                LIMIT ? OFFSET ?
+            ''', params + [limit, offset]).fetchall()
+        
+        return list(map(ListedCard._make, rows))
+    
+    def _sort_order(self, sort, descending):
+        """Keyset expressions and ORDER BY clause for a CARD_SORTS column"""
+        if sort not in CARD_SORTS:
+            raise ValueError(f"Unknown sort column: {sort}")
+        
+        keyset = [CARD_SORTS[sort]] + [column for column in ('created_at', 'id') if column != sort]
+        direction = 'DESC' if descending else 'ASC'
+        return keyset, ', '.join(f'{expression} {direction}' for expression in keyset)
+    
+    def sort_keyset(self, card, sort=DEFAULT_CARD_SORT):
+        """Keyset of a ListedCard for query_cards(after=...) under a CARD_SORTS column"""
+        fields = [sort] + [field for field in ('created_at', 'id') if field != sort]
+        # Sort expressions map NULL to '' (see CARD_SORTS)
+        values = [getattr(card, field) for field in fields]
+        return tuple('' if value is None else value for value in values)
+    
+    @traced
+    def get_masked_card(self, card_id, filters=None):
+        """Get one card with masked sensitive data, or None if it doesn't match the filters"""
+        clauses, params = self._filter_clauses(filters)
+        where = ''.join(f" AND {clause}" for clause in clauses)
+        
+        with self.connections.read() as conn:
+            row = conn.execute(f'''
+                SELECT {LIST_COLUMNS}
+                FROM bank_cards WHERE id = ?{where}
+            ''', [card_id] + params).fetchone()
+        
+        return ListedCard._make(row) if row else None
+    
+    @traced
+    def search_cards(self, text, filters=None, limit=100, cancelled=None,
+                     sort=DEFAULT_CARD_SORT, descending=True):
+        """Full-text search over bank, branch, IFSC and family member
+        
+        Returns (total matches, first page of masked cards in sort order).
+        cancelled is polled while the queries run; when it returns True the
+        search is aborted with sqlite3.OperationalError.
+        """
+        filters = dict(filters or {}, search=text)
+        _, order_by = self._sort_order(sort, descending)
+        clauses, params = self._filter_clauses(filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        
+        with self.connections.read(cancelled) as conn:
+            total = conn.execute(f'SELECT COUNT(*) FROM bank_cards {where}', params).fetchone()[0]
+            rows = conn.execute(f'''
+                SELECT {LIST_COLUMNS}
+                FROM bank_cards {where}
+                ORDER BY {order_by}
+                LIMIT ?
+            ''', params + [limit]).fetchall()
+        
+        return total, list(map(ListedCard._make, rows))
+    
+    @traced
+    def get_filter_values(self, name):
+        """Distinct values of an equality filter column, for filter pickers"""
+        if name not in CARD_FILTERS or not CARD_FILTERS[name].endswith('= ?'):
+            raise ValueError(f"Not a value filter: {name}")
+        
+        with self.connections.read() as conn:
+            rows = conn.execute(f'SELECT DISTINCT {name} FROM bank_cards ORDER BY {name}').fetchall()
+        return [row[0] for row in rows]
+    
+    @traced
+    def get_expiring_cards(self, days=EXPIRY_ALERT_DAYS, today=None):
+        """Masked cards expiring within days of today, soonest first"""
+        today = today or date.today()
+        with self.connections.snapshot() as conn:
+            rows = conn.execute(
+                SELECT_EXPIRING_SQL, (today.isoformat(), (today + timedelta(days=days)).isoformat())
+            ).fetchall()
+        return list(map(ListedCard._make, rows))
+    
+    @traced
+    def get_expiry_window(self, start, end):
+        """Change log position plus the masked cards expiring between two ISO dates"""
+        with self.connections.snapshot() as conn:
+            seq = conn.execute(MAX_CHANGE_SEQ_SQL).fetchone()[0]
+            rows = conn.execute(SELECT_EXPIRING_SQL, (start, end)).fetchall()
+        return seq, list(map(ListedCard._make, rows))
+    
+    @traced
+    def get_expiry_changes(self, since_seq, start, end, entering_from=None):
+        """What to re-evaluate in an expiry window since a change log position
+        
+        Returns (seq, changed card ids, cards): the cards are those changed
+        since since_seq that now expire between start and end, plus those
+        expiring between entering_from and end when the window has moved.
+        Both are index range scans, so the cost follows the number of
+        changes rather than the size of the vault. Returns None once the
+        change log has been pruned past since_seq.
+        """
+        with self.connections.snapshot() as conn:
+            if since_seq < conn.execute(SELECT_PRUNED_SEQ_SQL).fetchone()[0]:
+                return None
+            seq = conn.execute(MAX_CHANGE_SEQ_SQL).fetchone()[0]
+            changed_ids = set()
+            rows = []
+            if seq > since_seq:
+                changed_ids = {row[0] for row in conn.execute(SELECT_CHANGED_CARD_IDS_SQL, (since_seq, seq))}
+                rows = conn.execute(SELECT_CHANGED_EXPIRING_SQL, (since_seq, seq, start, end)).fetchall()
+            if entering_from is not None and entering_from <= end:
+                rows += conn.execute(SELECT_EXPIRING_SQL, (entering_from, end)).fetchall()
+        return seq, changed_ids, list(map(ListedCard._make, rows))
+    
+    @traced
+    def get_card_stats(self):
+        """Total card count plus per-value counts for each STATS_COLUMNS column
+        
+        Read from the trigger-maintained card_counts table, so the cost
+        follows the number of distinct values, not the number of cards.
+        """
+        with self.connections.read() as conn:
+            return self._card_stats(conn)
+    
+    def _card_stats(self, conn):
+        """get_card_stats() on an open connection"""
+        stats = {TOTAL_CARDS_DIMENSION: 0}
+        stats.update((name, {}) for name in STATS_COLUMNS)
+        for dimension, value, count in conn.execute(SELECT_CARD_COUNTS_SQL):
+            if dimension == TOTAL_CARDS_DIMENSION:
+                stats[dimension] = count
+            else:
+                stats[dimension][value] = count
+        return stats
+    
+    @traced
+    def get_card_by_id(self, card_id):
+        """Get card by ID for editing
+        
+        Served from the card cache while no other connection has written to
+        the database since the cache was last validated.
+        """
+        version = self.connections.data_version()
+        if version is not None:
+            if version != self._cache_version:
+                self.card_cache.clear()
+                self._cache_version = version
+            card = self.card_cache.get(card_id)
+            if card is not None:
+                return dict(card)
+        
+        generation = self.card_cache.generation
+        with self.connections.read() as conn:
+            row = conn.execute(SELECT_CARD_BY_ID_SQL, (card_id,)).fetchone()
+        
+        card = self._card(row)
+        if card is not None and version is not None:
+            self.card_cache.put(card_id, dict(card), generation)
+        return card
+    
+    def cache_stats(self):
+        """Hit/miss counters and size of the card cache"""
+        return self.card_cache.stats()
+    
+    def latency_stats(self):
+        """Traced call count and p50/p95/p99/max milliseconds per operation"""
+        return self.tracer.latency_stats()
+    
+    def dump_trace(self, filename, trace_format='chrome'):
+        """Write the traced operations to filename; returns the number of spans written"""
+        return self.tracer.dump(filename, trace_format)
+
+    def _card(self, row):
+        """Build an unmasked card dict from a full row"""
+        if row:
+            return {
+                'id': row[0],
+                'bank_name': row[1],
+                'branch_name': row[2],
+                'ifsc_code': row[3],
+                'account_number': row[4],
+                'atm_number': row[5],
+                'pin': row[6],
+                'validity_start': row[7],
+                'validity_end': row[8],
+                'cvv': row[9],
+                'card_type': row[10],
+                'card_network': row[11],
+                'family_member': row[12],
+                'created_at': row[13],
+                'updated_at': row[14]
+            }
+        return None
+    
+    @traced
+    def update_card(self, card_id, bank_name, branch_name, ifsc_code, account_number, 
+                   atm_number, pin, validity_start, validity_end, cvv, card_type, 
+                   card_network, family_member):
+        """Update existing card; returns False if there is no card with that id"""
+        now = datetime.now().isoformat()
+        
+        with self._unique_cards(), self.connections.transaction() as conn:
+            cursor = conn.execute(UPDATE_CARD_SQL, (
+                bank_name, branch_name, ifsc_code, account_number, atm_number, pin,
+                validity_start, validity_end, cvv, card_type, card_network, 
+                family_member, now,
+                self.mask_card_number(account_number), self.mask_card_number(atm_number),
+                card_id
+            ))
+            if not cursor.rowcount:
+                return False
+            self._record_changes(updated=[card_id])
+            if self.duplicate_cards:
+                self._retry_natural_key_index(conn)
+        return True
+    
+    @traced
+    def delete_card(self, card_id):
+        """Delete card by ID; returns False if there is no card with that id"""
+        with self.connections.transaction() as conn:
+            cursor = conn.execute(DELETE_CARD_SQL, (card_id,))
+            if not cursor.rowcount:
+                return False
+            self._record_changes(deleted=[card_id])
+            if self.duplicate_cards:
+                self._retry_natural_key_index(conn)
+        return True
+    
+    @traced
+    def get_all_cards_unmasked(self):
+        """Get all cards with unmasked sensitive data for export
+        
+        Returns a list of card dicts; iter_cards(masked=False) streams compact CardRecords instead.
+        """
+        return [card._asdict() for card in self.iter_cards(masked=False)]
+
+    @traced
+    def export_to_excel(self, filename, progress=None, cancelled=None):
+        """Export cards to Excel file
+        
+        Rows are streamed from a SQLite cursor into a write-only workbook, so
+        memory use does not grow with the number of cards. progress(done, total)
+        is called as rows are written; if cancelled() returns True the export
+        stops with JobCancelled before the file is saved.
+        """
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill, Alignment
+        from openpyxl.utils import get_column_letter
+        
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Bank Cards")
+        
+        # Style for headers
+        header_font = Font(bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        header_alignment = Alignment(horizontal="center", vertical="center")
+        
+        with self.connections.snapshot() as conn:
+            total = conn.execute(COUNT_CARDS_SQL).fetchone()[0]
+            
+            # Write-only sheets emit column widths before any row, so size the
+            # columns from an aggregate query instead of a second pass over cells
+            max_lengths = conn.execute(EXPORT_COLUMN_WIDTHS_SQL).fetchone()
+            for col, header in enumerate(EXPORT_HEADERS, 1):
+                max_length = max(len(header), max_lengths[col - 1] or 0)
+                ws.column_dimensions[get_column_letter(col)].width = min(max_length + 2, 50)
+            
+            # Add headers
+            header_row = []
+            for header in EXPORT_HEADERS:
+                cell = WriteOnlyCell(ws, value=header)
+                cell.font = header_font
+                cell.fill = header_fill
+                cell.alignment = header_alignment
+                header_row.append(cell)
+            ws.append(header_row)
+            
+            # The summary comes from the counters, read in the same snapshot
+            stats = self._card_stats(conn)
+            
+            # Stream data rows
+            total_cards = 0
+            for row in conn.execute(SELECT_ALL_CARDS_SQL):
+                ws.append(row)
+                total_cards += 1
+                
+                if total_cards % JOB_PROGRESS_ROWS == 0:
+                    if cancelled and cancelled():
+                        # Finish the sheet's temporary stream so nothing is left open
+                        ws.close()
+                        raise JobCancelled("Export cancelled")
+                    if progress:
+                        progress(total_cards, total)
+            
+            if progress:
+                progress(total_cards, total)
+        
+        # Add summary sheet
+        summary_ws = wb.create_sheet("Summary")
+        title_cell = WriteOnlyCell(summary_ws, value="Bank Cards Export Summary")
+        title_cell.font = Font(bold=True, size=14)
+        summary_ws.append([title_cell])
+        summary_ws.append([])
+        summary_ws.append(["Export Date:", datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
+        summary_ws.append(["Total Cards:", stats[TOTAL_CARDS_DIMENSION]])
+        for name in STATS_COLUMNS:
+            summary_ws.append([])
+            summary_ws.append([f"{STATS_LABELS[name]}:"])
+            for value, count in stats[name].items():
+                summary_ws.append([f"{value}:", count])
+        
+        # Save the workbook
+        wb.save(filename)
+        return total_cards
+    
+    @traced
+    def import_from_excel(self, filename, batch_size=IMPORT_BATCH_SIZE, chunk_callback=None,
+                          progress=None, cancelled=None, atomic=False,
+                          workers=IMPORT_WORKERS, rejections=None):
+        """Import cards from Excel file"""
+        from openpyxl import load_workbook
+        
+        try:
+            wb = load_workbook(filename, read_only=True, data_only=True)
+            try:
+                ws = wb.active
+                total = ws.max_row - 1 if ws.max_row else None
+                # Skip header row, start from row 2
+                rows = ws.iter_rows(min_row=2, values_only=True)
+                return self.import_rows(
+                    rows, batch_size, chunk_callback, progress=progress, cancelled=cancelled,
+                    total=total, atomic=atomic, workers=workers, rejections=rejections,
+                    first_row=2
+                )
+            finally:
+                wb.close()
+            
+        except JobCancelled:
+            raise
+        except Exception as e:
+            raise Exception(f"Failed to import Excel file: {e}")
+    
+    @traced
+    def import_rows(self, rows, batch_size=IMPORT_BATCH_SIZE, chunk_callback=None,
+                    progress=None, cancelled=None, total=None, atomic=False,
+                    workers=None, rejections=None, first_row=1):
+        """Validate and bulk upsert rows laid out like the Excel export columns
+        
+        Rows are processed in chunks of batch_size; each valid chunk is written
+        with a single INSERT ... ON CONFLICT DO UPDATE executemany inside one
+        transaction, so cards already in the vault (by natural key) are updated
+        in place, or left alone if nothing changed. chunk_callback, if
+        given, is called as chunk_callback(chunk_number, imported, skipped)
+        after every chunk, and progress(rows_done, total) likewise.
+        
+        With workers > 1, chunks are validated in a process pool and inserted
+        in their original order. Rejected rows are appended to the rejections
+        list, if given, as ImportRejection(row, field, rule) with row numbers
+        counted from first_row.
+        
+        With atomic=True the whole import runs in one transaction, so raising
+        JobCancelled when cancelled() returns True leaves the vault untouched.
+        
+        Returns an ImportSummary(imported, skipped, inserted, updated, unchanged).
+        """
+        if atomic:
+            with self.connections.transaction():
+                return self.import_rows(
+                    rows, batch_size, chunk_callback, progress=progress, cancelled=cancelled,
+                    total=total, workers=workers, rejections=rejections, first_row=first_row
+                )
+        
+        imported_count = 0
+        skipped_count = 0
+        inserted_count = updated_count = unchanged_count = 0
+        
+        chunks = self._chunk_rows(rows, batch_size, first_row)
+        for chunk_number, (cards, rejected) in enumerate(self._validate_chunks(chunks, workers), 1):
+            if cancelled and cancelled():
+                raise JobCancelled("Import cancelled")
+            
+            if cards:
+                now = datetime.now().isoformat()
+                inserted, updated, unchanged = self.bulk_upsert_cards([card + (now, now) for card in cards])
+                inserted_count += inserted
+                updated_count += updated
+                unchanged_count += unchanged
+            
+            imported_count += len(cards)
+            skipped_count += len(rejected)
+            if rejections is not None:
+                rejections.extend(rejected)
+            if chunk_callback:
+                chunk_callback(chunk_number, len(cards), len(rejected))
+            if progress:
+                progress(imported_count + skipped_count, total)
+        
+        return ImportSummary(imported_count, skipped_count, inserted_count, updated_count, unchanged_count)
+    
+    def _chunk_rows(self, rows, batch_size, first_row):
+        """Split rows into (first row number, rows) chunks"""
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= batch_size:
+                yield first_row, chunk
+                first_row += len(chunk)
+                chunk = []
+        
+        if chunk:
+            yield first_row, chunk
+    
+    def _validate_chunks(self, chunks, workers):
+        """Validate chunks in order, in a process pool when there is more than one chunk"""
+        chunks = iter(chunks)
+        head = list(itertools.islice(chunks, 2))
+        if not workers or workers < 2 or len(head) < 2:
+            for first_row, chunk in itertools.chain(head, chunks):
+                yield validate_import_chunk(chunk, first_row)
+            return
+        
+        from concurrent.futures import ProcessPoolExecutor
+        
+        # Keep a bounded number of chunks in flight so huge files stay in constant memory
+        pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            pending = deque()
+            for first_row, chunk in itertools.chain(head, chunks):
+                pending.append(pool.submit(validate_import_chunk, chunk, first_row))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+    
+    @traced
+    def bulk_insert_cards(self, records):
+        """Insert many cards in one transaction
+        
+        Each record holds the add_card fields followed by created_at and updated_at.
+        """
+        mask = self.mask_card_number
+        records = [record + (mask(record[3]), mask(record[4])) for record in records]
+        
+        with self.connections.transaction() as conn:
+            last_id = conn.execute(MAX_CARD_ID_SQL).fetchone()[0]
+            conn.executemany(INSERT_CARD_SQL, records)
+            card_ids = [row[0] for row in conn.execute(SELECT_CARD_IDS_AFTER_SQL, (last_id,))]
+            self._record_changes(inserted=card_ids)
+        
+        return len(records)
+    
+    @traced
+    def bulk_upsert_cards(self, records):
+        """Insert or update many cards by natural key in one transaction
+        
+        Records are laid out as for bulk_insert_cards. When several records
+        share a key only the last is written; the ones it supersedes count
+        as unchanged. Returns (inserted, updated, unchanged) counts;
+        unchanged cards are not written at all.
+        """
+        mask = self.mask_card_number
+        key_positions = [CARD_VALUE_COLUMNS.index(column) for column in self.natural_key]
+        unique = {tuple(record[position] for position in key_positions): record for record in records}
+        written = [record + (mask(record[3]), mask(record[4])) for record in unique.values()]
+        
+        with self._unique_cards(), self.connections.transaction() as conn:
+            # The upsert needs the unique index; resolving the duplicates lets it be built
+            duplicates = self.duplicate_cards and self._retry_natural_key_index(conn)
+            if duplicates:
+                self.duplicate_cards = duplicates
+                raise DuplicateCardError(
+                    f"{self.duplicate_cards_message()}. Edit or delete them before importing"
+                )
+            
+            # The change log's seq tells this batch's writes apart from everything else
+            last_seq = conn.execute(MAX_CHANGE_SEQ_SQL).fetchone()[0]
+            conn.executemany(self._upsert_sql, written)
+            inserted_ids, updated_ids = [], []
+            for card_id, operation in conn.execute(SELECT_WRITTEN_CARDS_SQL, (last_seq,)):
+                (inserted_ids if operation == 'insert' else updated_ids).append(card_id)
+            
+            self._record_changes(inserted=inserted_ids, updated=updated_ids)
+        
+        return len(inserted_ids), len(updated_ids), len(records) - len(inserted_ids) - len(updated_ids)
+    
+    @traced
+    def export_to_ndjson(self, filename, progress=None, cancelled=None):
+        """Export cards as newline-delimited JSON, one unmasked card per line
+        
+        Rows are written straight from a snapshot cursor; a filename ending in
+        .gz is gzip-compressed. Returns the number of cards written.
+        """
+        try:
+            with self.connections.snapshot() as conn:
+                total = conn.execute(COUNT_CARDS_SQL).fetchone()[0]
+                
+                with self._open_export_file(filename, 'w') as f:
+                    count = 0
+                    for row in conn.execute(SELECT_ALL_CARDS_SQL):
+                        f.write(json.dumps(dict(zip(CARD_FIELDS, row)), separators=(',', ':')))
+                        f.write('\n')
+                        count += 1
+                        
+                        if count % JOB_PROGRESS_ROWS == 0:
+                            if cancelled and cancelled():
+                                raise JobCancelled("Export cancelled")
+                            if progress:
+                                progress(count, total)
+        
+            if progress:
+                progress(count, total)
+        except BaseException:
+            # Don't leave a truncated export behind, whatever stopped it
+            self._remove_partial_export(filename)
+            raise
+        
+        return count
+    
+    @traced
+    def import_from_ndjson(self, filename, batch_size=IMPORT_BATCH_SIZE, chunk_callback=None,
+                           progress=None, cancelled=None, atomic=False,
+                           workers=IMPORT_WORKERS, rejections=None):
+        """Import cards from a (optionally gzip-compressed) NDJSON export
+        
+        Lines are parsed one at a time and fed to the batched import path;
+        unparseable lines are rejected like invalid rows.
+        """
+        def rows(f):
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    yield [record.get(field) for field in CARD_FIELDS]
+                except (ValueError, AttributeError):
+                    yield None
+        
+        try:
+            with self._open_export_file(filename, 'r') as f:
+                return self.import_rows(
+                    rows(f), batch_size, chunk_callback, progress=progress, cancelled=cancelled,
+                    atomic=atomic, workers=workers, rejections=rejections
+                )
+        except JobCancelled:
+            raise
+        except Exception as e:
+            raise Exception(f"Failed to import NDJSON file: {e}")
+    
+    @traced
+    def export_to_csv(self, filename, progress=None, cancelled=None):
+        """Export cards to CSV with the Excel column layout
+        
+        Rows are streamed from a snapshot cursor in blocks; a filename ending
+        in .gz is gzip-compressed. Returns the number of cards written.
+        """
+        try:
+            with self.connections.snapshot() as conn:
+                total = conn.execute(COUNT_CARDS_SQL).fetchone()[0]
+                
+                with self._open_export_file(filename, 'w') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(EXPORT_HEADERS)
+                    
+                    count = 0
+                    cursor = conn.execute(SELECT_ALL_CARDS_SQL)
+                    while True:
+                        rows = cursor.fetchmany(JOB_PROGRESS_ROWS)
+                        if not rows:
+                            break
+                        writer.writerows(rows)
+                        count += len(rows)
+                        
+                        if cancelled and cancelled():
+                            raise JobCancelled("Export cancelled")
+                        if progress:
+                            progress(count, total)
+        
+        except BaseException:
+            # Don't leave a truncated export behind, whatever stopped it
+            self._remove_partial_export(filename)
+            raise
+        
+        return count
+    
+    @traced
+    def import_from_csv(self, filename, batch_size=IMPORT_BATCH_SIZE, chunk_callback=None,
+                        progress=None, cancelled=None, atomic=False,
+                        workers=IMPORT_WORKERS, rejections=None):
+        """Import cards from a (optionally gzip-compressed) CSV with the Excel column layout"""
+        try:
+            with self._open_export_file(filename, 'r') as f:
+                reader = csv.reader(f)
+                # Skip header row
+                next(reader, None)
+                return self.import_rows(
+                    reader, batch_size, chunk_callback, progress=progress, cancelled=cancelled,
+                    atomic=atomic, workers=workers, rejections=rejections, first_row=2
+                )
+        except JobCancelled:
+            raise
+        except Exception as e:
+            raise Exception(f"Failed to import CSV file: {e}")
+    
+    @traced
+    def export_delta(self, filename, checkpoint=DEFAULT_CHECKPOINT, progress=None, cancelled=None):
+        """Export the cards changed since a checkpoint as an NDJSON delta, then advance it
+        
+        The first line is a header; each following line is either
+        {"op": "upsert", "card": {...}} with the card's current unmasked fields
+        or {"op": "delete", "key": {...}} with the identifying fields of a card
+        to remove. A card changed several times appears once. A checkpoint
+        the pruned change log can't follow gets a full copy instead. The
+        checkpoint only moves once the file is complete, and the log entries
+        every checkpoint has passed are then pruned. Returns the number of
+        change records written.
+        """
+        try:
+            with self.connections.snapshot() as conn:
+                row = conn.execute(SELECT_CHECKPOINT_SQL, (checkpoint,)).fetchone()
+                from_seq = row[0] if row else 0
+                to_seq = conn.execute(MAX_CHANGE_SEQ_SQL).fetchone()[0]
+                if from_seq < conn.execute(SELECT_PRUNED_SEQ_SQL).fetchone()[0]:
+                    # Every current card as an upsert, like a delta from the seeded log
+                    changes = (('insert', None) + row for row in conn.execute(SELECT_ALL_CARDS_SQL))
+                else:
+                    changes = conn.execute(SELECT_DELTA_SQL, (from_seq, to_seq))
+                
+                with self._open_export_file(filename, 'w') as f:
+                    f.write(json.dumps({
+                        'type': DELTA_FILE_TYPE,
+                        'checkpoint': checkpoint,
+                        'from_seq': from_seq,
+                        'to_seq': to_seq,
+                        'exported_at': datetime.now().isoformat()
+                    }) + '\n')
+                    
+                    count = 0
+                    changed_cards = 0
+                    for row in changes:
+                        first_operation, old_card = row[0], row[1]
+                        card = dict(zip(CARD_FIELDS, row[2:])) if row[2] is not None else None
+                        
+                        # A card that existed at the checkpoint under another key
+                        # (or not at all any more) must go from the target first
+                        if first_operation != 'insert' and old_card:
+                            old_key = json.loads(old_card)
+                            if card is None or any(card[field] != value for field, value in old_key.items()):
+                                f.write(json.dumps({'op': 'delete', 'key': old_key}, separators=(',', ':')) + '\n')
+                                count += 1
+                        if card is not None:
+                            f.write(json.dumps({'op': 'upsert', 'card': card}, separators=(',', ':')) + '\n')
+                            count += 1
+                        
+                        changed_cards += 1
+                        if changed_cards % JOB_PROGRESS_ROWS == 0:
+                            if cancelled and cancelled():
+                                raise JobCancelled("Export cancelled")
+                            if progress:
+                                progress(changed_cards, None)
+            
+            if progress:
+                progress(changed_cards, changed_cards)
+        except BaseException:
+            # Don't leave a truncated export behind, whatever stopped it
+            self._remove_partial_export(filename)
+            raise
+        
+        with self.connections.transaction() as conn:
+            conn.execute(SAVE_CHECKPOINT_SQL, (checkpoint, to_seq, datetime.now().isoformat()))
+            conn.execute(PRUNE_CHANGE_LOG_SQL)
+        return count
+    
+    @traced
+    def import_delta(self, filename, batch_size=IMPORT_BATCH_SIZE, progress=None, cancelled=None,
+                     rejections=None):
+        """Apply a delta written by export_delta, matching cards by natural key
+        
+        Upserted cards are checked like any import; rejected ones are skipped
+        and appended to rejections, if given, numbered by file line. Deletes
+        match on the key columns they carry, which are the source vault's
+        natural key when the change was logged. The whole delta is applied
+        in one transaction, so a failure or cancellation leaves the vault
+        untouched. Returns an ImportSummary.
+        """
+        inserted = updated = unchanged = skipped = 0
+        deleted_ids = []
+        batch = []
+        
+        def flush():
+            nonlocal inserted, updated, unchanged, skipped
+            if not batch:
+                return
+            rows = [(card.get('id'),) + tuple(card.get(field) for field in CARD_VALIDATOR.fields)
+                    for _, card in batch]
+            cards, rejected = CARD_VALIDATOR.validate_rows(rows, first_row=0)
+            failed = {rejection.row for rejection in rejected}
+            kept = [card for index, (_, card) in enumerate(batch) if index not in failed]
+            if cards:
+                now = datetime.now().isoformat()
+                counts = self.bulk_upsert_cards([
+                    values + (card.get('created_at') or now, card.get('updated_at') or now)
+                    for values, card in zip(cards, kept)
+                ])
+                inserted += counts[0]
+                updated += counts[1]
+                unchanged += counts[2]
+            skipped += len(rejected)
+            if rejections is not None:
+                rejections.extend(rejection._replace(row=batch[rejection.row][0]) for rejection in rejected)
+            batch.clear()
+        
+        try:
+            with self._open_export_file(filename, 'r') as f, self.connections.transaction() as conn:
+                header = json.loads(f.readline() or 'null')
+                if not isinstance(header, dict) or header.get('type') != DELTA_FILE_TYPE:
+                    raise ValueError("Not a card delta file")
+                
+                for line_number, line in enumerate(f, 2):
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    
+                    if record['op'] == 'upsert':
+                        batch.append((line_number, record['card']))
+                        if len(batch) >= batch_size:
+                            flush()
+                    elif record['op'] == 'delete':
+                        # Keep file order: the delete may free a key a later upsert reuses
+                        flush()
+                        key = record['key']
+                        unknown = set(key) - set(CHANGE_LOG_COLUMNS)
+                        if unknown or not key:
+                            raise ValueError(f"Invalid delete key on line {line_number}")
+                        delete_sql = SELECT_CARDS_BY_KEY_SQL.format(
+                            conditions=' AND '.join(f'{column} = ?' for column in key)
+                        )
+                        for (card_id,) in conn.execute(delete_sql, list(key.values())).fetchall():
+                            conn.execute(DELETE_CARD_SQL, (card_id,))
+                            deleted_ids.append(card_id)
+                    else:
+                        raise ValueError(f"Unknown delta operation on line {line_number}: {record['op']}")
+                    
+                    if line_number % JOB_PROGRESS_ROWS == 0:
+                        if cancelled and cancelled():
+                            raise JobCancelled("Import cancelled")
+                        if progress:
+                            progress(line_number - 1, None)
+                
+                flush()
+                self._record_changes(deleted=deleted_ids)
+        except JobCancelled:
+            raise
+        except Exception as e:
+            raise Exception(f"Failed to import delta file: {e}")
+        
+        imported = inserted + updated + unchanged
+        return ImportSummary(imported, skipped, inserted, updated, unchanged, len(deleted_ids))
+    
+    def file_format(self, filename):
+        """Export/import engine for a filename: 'excel', 'csv', 'ndjson', 'json' or 'delta'"""
+        name = filename.lower()
+        if name.endswith('.gz'):
+            name = name[:-3]
+        for extension, file_format in FILE_FORMATS.items():
+            if name.endswith(extension):
+                return file_format
+        raise ValueError(f"Unsupported file type: {filename}")
+    
+    @traced
+    def export_file(self, filename, progress=None, cancelled=None, checkpoint=DEFAULT_CHECKPOINT):
+        """Export cards with the engine matching the file extension"""
+        file_format = self.file_format(filename)
+        if file_format == 'delta':
+            return self.export_delta(filename, checkpoint, progress, cancelled)
+        if file_format == 'excel':
+            return self.export_to_excel(filename, progress, cancelled)
+        if file_format == 'csv':
+            return self.export_to_csv(filename, progress, cancelled)
+        if file_format == 'ndjson':
+            return self.export_to_ndjson(filename, progress, cancelled)
+        return self.export_to_json(filename, progress, cancelled)
+    
+    @traced
+    def import_file(self, filename, progress=None, cancelled=None, atomic=False, rejections=None):
+        """Import cards with the engine matching the file extension"""
+        file_format = self.file_format(filename)
+        if file_format == 'delta':
+            return self.import_delta(filename, progress=progress, cancelled=cancelled, rejections=rejections)
+        options = {'progress': progress, 'cancelled': cancelled, 'atomic': atomic, 'rejections': rejections}
+        if file_format == 'excel':
+            return self.import_from_excel(filename, **options)
+        if file_format == 'csv':
+            return self.import_from_csv(filename, **options)
+        if file_format == 'ndjson':
+            return self.import_from_ndjson(filename, **options)
+        raise ValueError("JSON exports can't be imported; use NDJSON (.ndjson) instead")
+    
+    def _open_export_file(self, filename, mode):
+        """Open a text export file with a large buffer, gzip-compressed if it ends in .gz"""
+        if filename.endswith('.gz'):
+            return gzip.open(filename, mode + 't', compresslevel=GZIP_LEVEL,
+                             encoding='utf-8', newline='')
+        return open(filename, mode, buffering=EXPORT_BUFFER_SIZE, encoding='utf-8', newline='')
+    
+    def _remove_partial_export(self, filename):
+        """Delete an export file that failed part way, if it was created at all"""
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+    
+    @traced
+    def export_to_json(self, filename, progress=None, cancelled=None):
+        """Export cards to JSON file (legacy support)
+        
+        Cards are written one at a time from a snapshot, laid out exactly as
+        json.dump(..., indent=2) would lay out the whole document.
+        """
+        try:
+            with self.connections.snapshot() as conn:
+                total = conn.execute(COUNT_CARDS_SQL).fetchone()[0]
+                header = json.dumps({
+                    'export_date': datetime.now().isoformat(),
+                    'version': '1.0.0',
+                    'total_cards': total,
+                    'cards': []
+                }, indent=2)
+                
+                with open(filename, 'w', buffering=EXPORT_BUFFER_SIZE) as f:
+                    # Everything up to the (last) empty cards list, then the cards
+                    f.write(header[:header.rindex('[]')])
+                    count = 0
+                    separator = '[\n    '
+                    for card in self._iter_records(conn, SELECT_ALL_CARDS_SQL):
+                        f.write(separator)
+                        f.write(json.dumps(card._asdict(), indent=2).replace('\n', '\n    '))
+                        separator = ',\n    '
+                        count += 1
+                        
+                        if count % JOB_PROGRESS_ROWS == 0:
+                            if cancelled and cancelled():
+                                raise JobCancelled("Export cancelled")
+                            if progress:
+                                progress(count, total)
+                    f.write('[]\n}' if not count else '\n  ]\n}')
+            
+            if progress:
+                progress(count, total)
+        except BaseException:
+            # Don't leave a truncated export behind, whatever stopped it
+            self._remove_partial_export(filename)
+            raise
+        
+        return count
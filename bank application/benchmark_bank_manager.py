@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Bank Manager Benchmarks - headless timings for CompleteDatabase and the exporters
+
+Run:      python benchmark_bank_manager.py run --sizes 1000 100000 --output results.json
+Compare:  python benchmark_bank_manager.py compare results.json baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from bank_database import CompleteDatabase, luhn_valid
+
+# Vault sizes run when --sizes is not given
+DEFAULT_SIZES = [1000, 100000]
+
+# Single-card operations are timed over this many calls (or the vault size, if smaller)
+SINGLE_OPERATIONS = 1000
+
+# Slowdown (fraction of the baseline time) reported as a regression
+DEFAULT_THRESHOLD = 0.20
+
+BANKS = ["State Bank", "HDFC Bank", "ICICI Bank", "Axis Bank", "Canara Bank", "Kotak Bank"]
+BRANCHES = ["Main Branch", "City Center", "Market Road", "Station Road", "Airport"]
+MEMBERS = ["John", "Jane", "Alex", "Sam", "Priya", "Ravi", "Meera", "Arjun"]
+NETWORKS = ["RuPay", "Visa", "Mastercard", "American Express"]
+
+class SyntheticVault:
+    """Generates reproducible fake card records"""
+    
+    def __init__(self, seed=42):
+        self.random = random.Random(seed)
+    
+    def card(self):
+        """One card as add_card arguments"""
+        rnd = self.random
+        start = datetime(2020, 1, 1) + timedelta(days=rnd.randrange(1500))
+        end = start + timedelta(days=365 * rnd.randint(3, 5))
+        return (
+            rnd.choice(BANKS),
+            rnd.choice(BRANCHES),
+            f"BANK0{rnd.randrange(10 ** 6):06d}",
+            str(rnd.randrange(10 ** 11, 10 ** 12)),
+            self.card_number(),
+            f"{rnd.randrange(10 ** 4):04d}",
+            start.strftime("%Y-%m-%d"),
+            end.strftime("%Y-%m-%d"),
+            f"{rnd.randrange(10 ** 3):03d}",
+            rnd.choice(["Debit", "Credit"]),
+            rnd.choice(NETWORKS),
+            rnd.choice(MEMBERS)
+        )
+    
+    def card_number(self):
+        """A random 16-digit card number with a valid Luhn check digit"""
+        body = str(self.random.randrange(4 * 10 ** 14, 6 * 10 ** 14))
+        return next(body + digit for digit in "0123456789" if luhn_valid(body + digit))
+    
+    def fill(self, database, size, batch_size=10000):
+        """Bulk insert size cards into a database"""
+        now = datetime.now().isoformat()
+        remaining = size
+        while remaining:
+            count = min(batch_size, remaining)
+            database.bulk_insert_cards([self.card() + (now, now) for _ in range(count)])
+            remaining -= count
+
+class BenchmarkSuite:
+    """Times CompleteDatabase operations against synthetic vaults"""
+    
+    def __init__(self, workdir, track_memory=True):
+        self.workdir = workdir
+        self.track_memory = track_memory
+        self.results = []
+    
+    def measure(self, size, operation, rows, func):
+        """Record wall time, rows/sec and peak traced memory for func
+        
+        tracemalloc slows Python code down several times, so the timed run is
+        untraced and peak memory comes from a second, traced run.
+        """
+        started = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - started
+        
+        peak = None
+        if self.track_memory:
+            tracemalloc.start()
+            try:
+                func()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        
+        result = {
+            'size': size,
+            'operation': operation,
+            'rows': rows,
+            'seconds': round(seconds, 6),
+            'rows_per_sec': round(rows / seconds, 1) if seconds > 0 else None,
+            'peak_memory_bytes': peak
+        }
+        self.results.append(result)
+        print(f"{size:>9,} {operation:<18} {seconds:10.3f}s {result['rows_per_sec'] or 0:>14,.0f} rows/s"
+              + (f" {peak / 2 ** 20:10.1f} MiB" if peak is not None else ""))
+        return result
+    
+    def run_size(self, size):
+        """Benchmark every operation against a vault of the given size"""
+        vault_dir = tempfile.mkdtemp(prefix=f"vault_{size}_", dir=self.workdir)
+        database = CompleteDatabase("benchmark", os.path.join(vault_dir, "vault.db"))
+        vault = SyntheticVault()
+        vault.fill(database, size)
+        
+        singles = min(SINGLE_OPERATIONS, size)
+        with database.connections.read() as conn:
+            card_ids = [row[0] for row in conn.execute('SELECT id FROM bank_cards')]
+        sample_ids = random.Random(7).sample(card_ids, singles)
+        
+        self.measure(size, 'get_all_cards', size, database.get_all_cards)
+        self.measure(size, 'iter_cards', size, lambda: sum(1 for _ in database.iter_cards()))
+        
+        database.card_cache.clear()
+        self.measure(size, 'get_card_by_id', singles,
+                     lambda: [database.get_card_by_id(card_id) for card_id in sample_ids])
+        
+        json_file = os.path.join(vault_dir, "export.json")
+        self.measure(size, 'export_to_json', size, lambda: database.export_to_json(json_file))
+        
+        excel_file = os.path.join(vault_dir, "export.xlsx")
+        self.measure(size, 'export_to_excel', size, lambda: database.export_to_excel(excel_file))
+        
+        updates = [(card_id, vault.card()) for card_id in sample_ids]
+        self.measure(size, 'update_card', singles,
+                     lambda: [database.update_card(card_id, *card) for card_id, card in updates])
+        
+        # measure() runs each operation twice (timed, then traced), and a card
+        # can only be added once, so each run gets its own batch
+        additions = iter([[vault.card() for _ in range(singles)] for _ in range(2)])
+        self.measure(size, 'add_card', singles,
+                     lambda: [database.add_card(*card) for card in next(additions)])
+        
+        # Re-syncing the same workbook should only write the cards changed since the export
+        self.measure(size, 'resync_from_excel', size, lambda: database.import_from_excel(excel_file))
+        database.close()
+        
+        self.measure(size, 'import_from_excel', size, lambda: self.import_fresh(vault_dir, excel_file))
+    
+    def import_fresh(self, vault_dir, excel_file):
+        """Import into a new, empty vault so every run pays the full insert cost"""
+        target_dir = tempfile.mkdtemp(prefix="import_", dir=vault_dir)
+        target = CompleteDatabase("benchmark", os.path.join(target_dir, "vault.db"))
+        try:
+            target.import_from_excel(excel_file)
+        finally:
+            target.close()
+    
+    def report(self):
+        """Results with the environment they were measured in"""
+        return {
+            'created_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'track_memory': self.track_memory,
+            'results': self.results
+        }
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare two result reports; returns the list of regressions found"""
+    base = {(r['size'], r['operation']): r for r in baseline['results']}
+    regressions = []
+    
+    if current.get('track_memory') != baseline.get('track_memory'):
+        print("Warning: only one of the runs tracked memory; memory is not compared")
+    
+    print(f"{'size':>9} {'operation':<18} {'baseline':>10} {'current':>10} {'change':>8}")
+    for result in current['results']:
+        key = (result['size'], result['operation'])
+        if key not in base:
+            continue
+        before = base[key]
+        
+        change = result['seconds'] / before['seconds'] - 1 if before['seconds'] else 0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION (time)"
+            regressions.append({'size': key[0], 'operation': key[1], 'metric': 'seconds',
+                                'baseline': before['seconds'], 'current': result['seconds']})
+        
+        if result.get('peak_memory_bytes') and before.get('peak_memory_bytes'):
+            if result['peak_memory_bytes'] > before['peak_memory_bytes'] * (1 + threshold):
+                flag += "  REGRESSION (memory)"
+                regressions.append({'size': key[0], 'operation': key[1], 'metric': 'peak_memory_bytes',
+                                    'baseline': before['peak_memory_bytes'],
+                                    'current': result['peak_memory_bytes']})
+        
+        print(f"{key[0]:>9,} {key[1]:<18} {before['seconds']:>9.3f}s {result['seconds']:>9.3f}s {change:>+8.1%}{flag}")
+    
+    return regressions
+
+def load_results(filename):
+    """Read a results file"""
+    with open(filename) as f:
+        return json.load(f)
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark CompleteDatabase and the exporters")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    run = commands.add_parser("run", help="benchmark synthetic vaults")
+    run.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                     help="vault sizes in cards (default: %(default)s)")
+    run.add_argument("--output", default="benchmark_results.json", help="results file to write")
+    run.add_argument("--baseline", help="results file to compare against")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                     help="allowed slowdown before flagging a regression (default: %(default)s)")
+    run.add_argument("--workdir", help="directory for the synthetic vaults (default: a temp dir)")
+    run.add_argument("--no-memory", action="store_true",
+                     help="skip the second, tracemalloc-traced run that measures peak memory")
+    
+    compare = commands.add_parser("compare", help="compare a results file against a baseline")
+    compare.add_argument("results")
+    compare.add_argument("baseline")
+    compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == "run":
+        workdir = args.workdir or tempfile.mkdtemp(prefix="bank_benchmark_")
+        suite = BenchmarkSuite(workdir, track_memory=not args.no_memory)
+        try:
+            for size in args.sizes:
+                suite.run_size(size)
+        finally:
+            # Synthetic vaults can be large; keep them only if asked to
+            if not args.workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+        
+        report = suite.report()
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+        
+        if not args.baseline:
+            return 0
+        current, baseline = report, load_results(args.baseline)
+    else:
+        current, baseline = load_results(args.results), load_results(args.baseline)
+    
+    regressions = compare_results(current, baseline, args.threshold)
+    print(f"{len(regressions)} regression(s) found")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,402 +1,78 @@
 #!/usr/bin/env python3
 """
 Complete Bank Manager - All Features Included
+
+Run with --startup-times (or BANK_MANAGER_STARTUP_TIMES=1) to print how long
+each startup phase takes.
 """
 
+import time
+STARTUP_STARTED = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import sqlite3
-import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils import get_column_letter
+from bank_database import (CARD_VALIDATOR, DEFAULT_CARD_SORT, EXPIRY_ALERT_DAYS, STATS_COLUMNS, STATS_LABELS,
+                           CompleteDatabase, ExpiryWatch, JobCancelled, StartupTimer)
 
-class CompleteDatabase:
-    """Complete database with all features"""
-    
-    def __init__(self, master_password):
-        self.master_password = master_password
-        self.db_path = 'complete_bank_manager.db'
-        self._init_database()
-    
-    def _init_database(self):
-        """Initialize database with all fields"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bank_cards (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                bank_name TEXT NOT NULL,
-                branch_name TEXT NOT NULL,
-                ifsc_code TEXT NOT NULL,
-                account_number TEXT NOT NULL,
-                atm_number TEXT NOT NULL,
-                pin TEXT NOT NULL,
-                validity_start TEXT NOT NULL,
-                validity_end TEXT NOT NULL,
-                cvv TEXT NOT NULL,
-                card_type TEXT NOT NULL,
-                card_network TEXT NOT NULL,
-                family_member TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-    
-    def mask_card_number(self, card_number):
-        """Mask card number"""
-        if len(card_number) >= 16:
-            return f"{card_number[:4]} **** **** {card_number[-4:]}"
-        return "**** **** **** ****"
-    
-    def mask_cvv(self, cvv):
-        """Mask CVV"""
-        if len(cvv) == 3:
-            return "***"
-        return "**"
-    
-    def add_card(self, bank_name, branch_name, ifsc_code, account_number, atm_number, pin, 
-                 validity_start, validity_end, cvv, card_type, card_network, family_member):
-        """Add new bank card"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        now = datetime.now().isoformat()
-        
-        cursor.execute('''
-            INSERT INTO bank_cards 
-            (bank_name, branch_name, ifsc_code, account_number, atm_number, pin, 
-             validity_start, validity_end, cvv, card_type, card_network, 
-             family_member, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            bank_name, branch_name, ifsc_code, account_number, atm_number, pin, 
-            validity_start, validity_end, cvv, card_type, card_network, 
-            family_member, now, now
-        ))
-        
-        card_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return card_id
-    
-    def get_all_cards(self):
-        """Get all cards with masked sensitive data"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, bank_name, branch_name, ifsc_code, account_number, atm_number, 
-                   pin, validity_start, validity_end, cvv, card_type, card_network,
-                   family_member, created_at, updated_at
-            FROM bank_cards
-            ORDER BY created_at DESC
-        ''')
-        
-        cards = []
-        for row in cursor.fetchall():
-            card_data = {
-                'id': row[0],
-                'bank_name': row[1],
-                'branch_name': row[2],
-                'ifsc_code': row[3],
-                'account_number': self.mask_card_number(row[4]),
-                'atm_number': self.mask_card_number(row[5]),
-                'pin': self.mask_cvv(row[6]),
-                'validity_start': row[7],
-                'validity_end': row[8],
-                'cvv': self.mask_cvv(row[9]),
-                'card_type': row[10],
-                'card_network': row[11],
-                'family_member': row[12],
-                'created_at': row[13],
-                'updated_at': row[14]
-            }
-            cards.append(card_data)
-        
-        conn.close()
-        return cards
-    
-    def get_card_by_id(self, card_id):
-        """Get card by ID for editing"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, bank_name, branch_name, ifsc_code, account_number, atm_number, 
-                   pin, validity_start, validity_end, cvv, card_type, card_network,
-                   family_member, created_at, updated_at
-            FROM bank_cards WHERE id = ?
-        ''', (card_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return {
-                'id': row[0],
-                'bank_name': row[1],
-                'branch_name': row[2],
-                'ifsc_code': row[3],
-                'account_number': row[4],
-                'atm_number': row[5],
-                'pin': row[6],
-                'validity_start': row[7],
-                'validity_end': row[8],
-                'cvv': row[9],
-                'card_type': row[10],
-                'card_network': row[11],
-                'family_member': row[12],
-                'created_at': row[13],
-                'updated_at': row[14]
-            }
-        return None
-    
-    def update_card(self, card_id, bank_name, branch_name, ifsc_code, account_number, 
-                   atm_number, pin, validity_start, validity_end, cvv, card_type, 
-                   card_network, family_member):
-        """Update existing card"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        now = datetime.now().isoformat()
-        
-        cursor.execute('''
-            UPDATE bank_cards 
-            SET bank_name=?, branch_name=?, ifsc_code=?, account_number=?, atm_number=?, 
-                pin=?, validity_start=?, validity_end=?, cvv=?, card_type=?, 
-                card_network=?, family_member=?, updated_at=?
-            WHERE id=?
-        ''', (
-            bank_name, branch_name, ifsc_code, account_number, atm_number, pin,
-            validity_start, validity_end, cvv, card_type, card_network, 
-            family_member, now, card_id
-        ))
-        
-        conn.commit()
-        conn.close()
-    
-    def delete_card(self, card_id):
-        """Delete card by ID"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM bank_cards WHERE id = ?', (card_id,))
-        conn.commit()
-        conn.close()
-    
-    def get_all_cards_unmasked(self):
-        """Get all cards with unmasked sensitive data for export"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, bank_name, branch_name, ifsc_code, account_number, atm_number, 
-                   pin, validity_start, validity_end, cvv, card_type, card_network,
-                   family_member, created_at, updated_at
-            FROM bank_cards
-            ORDER BY created_at DESC
-        ''')
-        
-        cards = []
-        for row in cursor.fetchall():
-            card_data = {
-                'id': row[0],
-                'bank_name': row[1],
-                'branch_name': row[2],
-                'ifsc_code': row[3],
-                'account_number': row[4],  # Unmasked
-                'atm_number': row[5],      # Unmasked
-                'pin': row[6],             # Unmasked
-                'validity_start': row[7],
-                'validity_end': row[8],
-                'cvv': row[9],             # Unmasked
-                'card_type': row[10],
-                'card_network': row[11],
-                'family_member': row[12],
-                'created_at': row[13],
-                'updated_at': row[14]
-            }
-            cards.append(card_data)
-        
-        conn.close()
-        return cards
+# File dialog choices for export and import
+FILE_TYPES = [
+    ("Excel files", "*.xlsx"),
+    ("CSV files", "*.csv"),
+    ("Compressed CSV files", "*.csv.gz"),
+    ("NDJSON files", "*.ndjson"),
+    ("Compressed NDJSON files", "*.ndjson.gz"),
+    ("Delta files", "*.delta.ndjson"),
+    ("All files", "*.*")
+]
 
-    def export_to_excel(self, filename):
-        """Export cards to Excel file"""
-        cards = self.get_all_cards_unmasked()
-        
-        # Create a new workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Bank Cards"
-        
-        # Define headers
-        headers = [
-            "ID", "Bank Name", "Branch Name", "IFSC Code", "Account Number", 
-            "ATM Number", "PIN", "Valid From", "Valid Until", "CVV", 
-            "Card Type", "Card Network", "Family Member", "Created At", "Updated At"
-        ]
-        
-        # Style for headers
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        
-        # Add headers
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-        
-        # Add data rows
-        for row, card in enumerate(cards, 2):
-            ws.cell(row=row, column=1, value=card['id'])
-            ws.cell(row=row, column=2, value=card['bank_name'])
-            ws.cell(row=row, column=3, value=card['branch_name'])
-            ws.cell(row=row, column=4, value=card['ifsc_code'])
-            ws.cell(row=row, column=5, value=card['account_number'])
-            ws.cell(row=row, column=6, value=card['atm_number'])
-            ws.cell(row=row, column=7, value=card['pin'])
-            ws.cell(row=row, column=8, value=card['validity_start'])
-            ws.cell(row=row, column=9, value=card['validity_end'])
-            ws.cell(row=row, column=10, value=card['cvv'])
-            ws.cell(row=row, column=11, value=card['card_type'])
-            ws.cell(row=row, column=12, value=card['card_network'])
-            ws.cell(row=row, column=13, value=card['family_member'])
-            ws.cell(row=row, column=14, value=card['created_at'])
-            ws.cell(row=row, column=15, value=card['updated_at'])
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = get_column_letter(column[0].column)
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Add summary sheet
-        summary_ws = wb.create_sheet("Summary")
-        summary_ws['A1'] = "Bank Cards Export Summary"
-        summary_ws['A1'].font = Font(bold=True, size=14)
-        
-        summary_ws['A3'] = "Export Date:"
-        summary_ws['B3'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        summary_ws['A4'] = "Total Cards:"
-        summary_ws['B4'] = len(cards)
-        
-        summary_ws['A6'] = "Card Types:"
-        card_types = {}
-        for card in cards:
-            card_type = card['card_type']
-            card_types[card_type] = card_types.get(card_type, 0) + 1
-        
-        row = 7
-        for card_type, count in card_types.items():
-            summary_ws[f'A{row}'] = f"{card_type}:"
-            summary_ws[f'B{row}'] = count
-            row += 1
-        
-        # Save the workbook
-        wb.save(filename)
-        return len(cards)
-    
-    def import_from_excel(self, filename):
-        """Import cards from Excel file"""
-        try:
-            wb = load_workbook(filename, data_only=True)
-            ws = wb.active
-            
-            imported_count = 0
-            skipped_count = 0
-            
-            # Skip header row, start from row 2
-            for row in range(2, ws.max_row + 1):
-                try:
-                    # Read data from Excel
-                    bank_name = str(ws.cell(row=row, column=2).value or "").strip()
-                    branch_name = str(ws.cell(row=row, column=3).value or "").strip()
-                    ifsc_code = str(ws.cell(row=row, column=4).value or "").strip()
-                    account_number = str(ws.cell(row=row, column=5).value or "").strip()
-                    atm_number = str(ws.cell(row=row, column=6).value or "").strip()
-                    pin = str(ws.cell(row=row, column=7).value or "").strip()
-                    validity_start = str(ws.cell(row=row, column=8).value or "").strip()
-                    validity_end = str(ws.cell(row=row, column=9).value or "").strip()
-                    cvv = str(ws.cell(row=row, column=10).value or "").strip()
-                    card_type = str(ws.cell(row=row, column=11).value or "Debit").strip()
-                    card_network = str(ws.cell(row=row, column=12).value or "RuPay").strip()
-                    family_member = str(ws.cell(row=row, column=13).value or "").strip()
-                    
-                    # Validate required fields
-                    if not all([bank_name, branch_name, ifsc_code, account_number, atm_number, pin, cvv, validity_start, validity_end, family_member]):
-                        skipped_count += 1
-                        continue
-                    
-                    # Clean account and ATM numbers (remove spaces)
-                    account_number = ''.join(filter(str.isdigit, account_number))
-                    atm_number = ''.join(filter(str.isdigit, atm_number))
-                    
-                    # Validate ATM number length
-                    if len(atm_number) != 16:
-                        skipped_count += 1
-                        continue
-                    
-                    # Validate date format
-                    try:
-                        datetime.strptime(validity_start, "%Y-%m-%d")
-                        datetime.strptime(validity_end, "%Y-%m-%d")
-                    except ValueError:
-                        skipped_count += 1
-                        continue
-                    
-                    # Add card to database
-                    self.add_card(
-                        bank_name, branch_name, ifsc_code, account_number, atm_number, pin,
-                        validity_start, validity_end, cvv, card_type, card_network, family_member
-                    )
-                    imported_count += 1
-                    
-                except Exception as e:
-                    skipped_count += 1
-                    continue
-            
-            return imported_count, skipped_count
-            
-        except Exception as e:
-            raise Exception(f"Failed to import Excel file: {e}")
-    
-    def export_to_json(self, filename):
-        """Export cards to JSON file (legacy support)"""
-        cards = self.get_all_cards_unmasked()
-        
-        export_data = {
-            'export_date': datetime.now().isoformat(),
-            'version': '1.0.0',
-            'total_cards': len(cards),
-            'cards': cards
-        }
-        
-        with open(filename, 'w') as f:
-            json.dump(export_data, f, indent=2)
-        
-        return len(cards)
+# Virtual card list: rows per fetched page, cached pages and rows prefetched
+# above and below the visible window
+LIST_PAGE_SIZE = 200
+LIST_CACHED_PAGES = 8
+LIST_OVERSCAN = 50
+LIST_ROW_HEIGHT = 22
+
+# Card list heading -> CARD_SORTS column it sorts by
+LIST_SORT_COLUMNS = {
+    "Bank": 'bank_name',
+    "Branch": 'branch_name',
+    "Account": 'account_number',
+    "ATM": 'atm_number',
+    "Type": 'card_type',
+    "Network": 'card_network',
+    "Member": 'family_member',
+    "Valid Until": 'expires_on',
+}
+
+# Progress dialog polling interval for long jobs
+JOB_POLL_MS = 100
+
+# Search box: quiet time before a search starts, and result polling interval
+SEARCH_DEBOUNCE_MS = 250
+SEARCH_POLL_MS = 20
+
+# Diagnostics and dashboard window refresh intervals
+DIAGNOSTICS_REFRESH_MS = 1000
+DASHBOARD_REFRESH_MS = 2000
+
+# Expiry scheduler tick, and rows shown in the expiring-soon panel
+EXPIRY_CHECK_MS = 60000
+EXPIRY_LIST_HEIGHT = 4
+
+STARTUP_TIMES_ENV_VAR = 'BANK_MANAGER_STARTUP_TIMES'
 
 class LoginWindow:
     """Login window"""
     
-    def __init__(self):
+    def __init__(self, startup_timer=None):
+        self.startup_timer = startup_timer
         self.root = tk.Tk()
         self.root.title("Complete Bank Manager - Login")
         self.root.geometry("400x200")
@@ -407,6 +83,15 @@ class LoginWindow:
         
         self.database = None
         self.create_widgets()
+        
+        if self.startup_timer:
+            self.startup_timer.mark('create login window')
+            self.root.after_idle(self.report_startup)
+    
+    def report_startup(self):
+        """Print the startup breakdown once the login window is idle"""
+        self.startup_timer.mark('show login window')
+        print(self.startup_timer.report("Startup to login"), file=sys.stderr)
     
     def center_window(self, window):
         """Center window on screen"""
@@ -448,7 +133,9 @@ class LoginWindow:
             return
         
         try:
-            self.database = CompleteDatabase(password)
+            if self.startup_timer:
+                self.startup_timer.restart()
+            self.database = CompleteDatabase(password, startup_timer=self.startup_timer, track_changes=True)
             self.root.destroy()
             self.show_main_window()
         except Exception as e:
@@ -456,17 +143,256 @@ class LoginWindow:
     
     def show_main_window(self):
         """Show main window after login"""
-        MainWindow(self.database)
+        MainWindow(self.database, self.startup_timer)
     
     def run(self):
         """Run the login window"""
         self.root.mainloop()
 
+class VirtualCardList:
+    """Drives a Treeview that only holds the visible window of cards
+    
+    Rows are fetched page by page through fetch_page(offset, limit) as the
+    scrollbar moves; the Treeview items are reused for every window.
+    """
+    
+    def __init__(self, tree, scrollbar, count_rows, fetch_page, fetch_card,
+                 page_size=LIST_PAGE_SIZE, cached_pages=LIST_CACHED_PAGES,
+                 overscan=LIST_OVERSCAN):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.count_rows = count_rows
+        self.fetch_page = fetch_page
+        self.fetch_card = fetch_card
+        self.page_size = page_size
+        self.cached_pages = cached_pages
+        self.overscan = overscan
+        
+        self.total = 0
+        self.first = 0
+        self.visible_rows = int(str(tree.cget("height")))
+        self.pages = OrderedDict()
+        self.window = []
+        self.items_by_id = {}
+        self.selected_id = None
+        
+        ttk.Style(tree).configure("Treeview", rowheight=LIST_ROW_HEIGHT)
+        self.scrollbar.configure(command=self.on_scrollbar)
+        
+        self.tree.bind("<Configure>", self.on_resize, add="+")
+        self.tree.bind("<<TreeviewSelect>>", self.on_select, add="+")
+        self.tree.bind("<MouseWheel>", self.on_mousewheel, add="+")
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-3), add="+")
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(3), add="+")
+        self.tree.bind("<Up>", lambda e: self.on_arrow(-1))
+        self.tree.bind("<Down>", lambda e: self.on_arrow(1))
+        self.tree.bind("<Prior>", lambda e: self.on_page(-1))
+        self.tree.bind("<Next>", lambda e: self.on_page(1))
+    
+    @staticmethod
+    def row_values(card):
+        """Treeview values for a card"""
+        return (
+            card.bank_name,
+            card.branch_name,
+            card.account_number,
+            card.atm_number,
+            card.card_type,
+            card.card_network,
+            card.family_member,
+            card.validity_end
+        )
+    
+    def reload(self):
+        """Drop cached pages and re-read the row count, keeping the scroll position"""
+        self.pages.clear()
+        self.total = self.count_rows()
+        self.render()
+    
+    def show_results(self, total, first_page):
+        """Show a listing whose count and first page were fetched elsewhere"""
+        self.pages.clear()
+        self.pages[0] = first_page
+        self.total = total
+        self.first = 0
+        self.render()
+    
+    def apply_changes(self, changes):
+        """Patch the list for the card ids in a CardChanges"""
+        if self.selected_id in changes.deleted:
+            self.selected_id = None
+        
+        if changes.inserted or changes.deleted:
+            # Row positions shift, so keep the offset steady relative to the
+            # cards above the window that we know were removed, then refetch
+            # just the window
+            removed_above = 0
+            for index, page in self.pages.items():
+                for position, card in enumerate(page, index * self.page_size):
+                    if position < self.first and card.id in changes.deleted:
+                        removed_above += 1
+            self.first -= removed_above
+            self.reload()
+            return
+        
+        # Pure updates are patched in place, one row at a time
+        for card_id in changes.updated:
+            cached = [page for page in self.pages.values()
+                      if any(card.id == card_id for card in page)]
+            if not cached:
+                continue
+            
+            card = self.fetch_card(card_id)
+            if card is None:
+                # No longer part of this listing
+                self.reload()
+                return
+            for page in cached:
+                for position, old in enumerate(page):
+                    if old.id == card_id:
+                        page[position] = card
+            for position, old in enumerate(self.window):
+                if old.id == card_id:
+                    self.window[position] = card
+            
+            item = self.items_by_id.get(card_id)
+            if item is not None:
+                self.tree.item(item, values=self.row_values(card))
+    
+    def _page(self, index):
+        """Return one page of cards, fetching it if not cached"""
+        if index in self.pages:
+            self.pages.move_to_end(index)
+            return self.pages[index]
+        
+        # Continue from the previous page by keyset when we have it
+        previous = self.pages.get(index - 1)
+        after = previous[-1] if previous and len(previous) == self.page_size else None
+        cards = self.fetch_page(index * self.page_size, self.page_size, after)
+        self.pages[index] = cards
+        while len(self.pages) > self.cached_pages:
+            self.pages.popitem(last=False)
+        return cards
+    
+    def _rows(self, start, stop):
+        """Return the cards at positions start..stop-1"""
+        if stop <= start:
+            return []
+        
+        first_page = start // self.page_size
+        last_page = (stop - 1) // self.page_size
+        cards = []
+        for index in range(first_page, last_page + 1):
+            cards.extend(self._page(index))
+        
+        offset = start - first_page * self.page_size
+        return cards[offset:offset + stop - start]
+    
+    def render(self):
+        """Show the current window of cards in the Treeview"""
+        self.first = max(0, min(self.first, self.total - self.visible_rows))
+        stop = min(self.total, self.first + self.visible_rows)
+        
+        # Load the overscan around the window so small scrolls hit the cache
+        start = max(0, self.first - self.overscan)
+        rows = self._rows(start, min(self.total, stop + self.overscan))
+        self.window = rows[self.first - start:stop - start]
+        
+        # Reuse existing items, adding or removing only the difference
+        items = list(self.tree.get_children())
+        while len(items) < len(self.window):
+            items.append(self.tree.insert("", "end"))
+        if len(items) > len(self.window):
+            self.tree.delete(*items[len(self.window):])
+            items = items[:len(self.window)]
+        
+        selected = []
+        self.items_by_id = {}
+        for item, card in zip(items, self.window):
+            self.tree.item(item, values=self.row_values(card), tags=(card.id,))
+            self.items_by_id[card.id] = item
+            if card.id == self.selected_id:
+                selected.append(item)
+        
+        if tuple(selected) != tuple(self.tree.selection()):
+            self.tree.selection_set(selected)
+        self.tree.yview_moveto(0)
+        
+        if self.total:
+            self.scrollbar.set(self.first / self.total, stop / self.total)
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def scroll_by(self, rows):
+        """Move the window by a number of rows"""
+        self.first += rows
+        self.render()
+    
+    def on_scrollbar(self, *args):
+        """Translate scrollbar commands into window moves"""
+        if args[0] == "moveto":
+            self.first = int(float(args[1]) * self.total)
+            self.render()
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible_rows
+            self.scroll_by(amount)
+    
+    def on_mousewheel(self, event):
+        """Scroll three rows per wheel event"""
+        if event.delta:
+            self.scroll_by(-3 if event.delta > 0 else 3)
+    
+    def on_arrow(self, direction):
+        """Scroll the window when the keyboard moves past its edge"""
+        items = self.tree.get_children()
+        if not items:
+            return "break"
+        
+        focus = self.tree.focus()
+        index = items.index(focus) if focus in items else 0
+        if 0 <= index + direction < len(items):
+            return None
+        
+        self.scroll_by(direction)
+        items = self.tree.get_children()
+        edge = items[0] if direction < 0 else items[-1]
+        self.tree.focus(edge)
+        self.tree.selection_set(edge)
+        return "break"
+    
+    def on_page(self, direction):
+        """Page Up / Page Down"""
+        self.scroll_by(direction * self.visible_rows)
+        return "break"
+    
+    def on_resize(self, event):
+        """Fit the window size to the Treeview height"""
+        items = self.tree.get_children()
+        bbox = self.tree.bbox(items[0]) if items else ""
+        header_height = bbox[1] if bbox else LIST_ROW_HEIGHT
+        
+        visible_rows = max(1, (event.height - header_height) // LIST_ROW_HEIGHT)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.render()
+    
+    def on_select(self, event=None):
+        """Remember the selected card id across window moves"""
+        selection = self.tree.selection()
+        if selection:
+            self.selected_id = int(self.tree.item(selection[0], "tags")[0])
+        elif self.selected_id in self.items_by_id:
+            # Cleared while visible, not just scrolled out of view
+            self.selected_id = None
+
 class MainWindow:
     """Main application window"""
     
-    def __init__(self, database):
+    def __init__(self, database, startup_timer=None):
         self.database = database
+        self.startup_timer = startup_timer
         self.root = tk.Tk()
         self.root.title("Complete Bank Manager")
         self.root.geometry("1000x700")
@@ -476,6 +402,27 @@ class MainWindow:
         
         self.create_widgets()
         self.refresh_cards()
+        
+        if self.database.duplicate_cards:
+            self.root.after_idle(self.report_duplicates)
+        
+        if self.startup_timer:
+            self.startup_timer.mark('create main window')
+            self.root.after_idle(self.report_startup)
+    
+    def report_duplicates(self):
+        """Ask the user to resolve cards that share a natural key"""
+        messagebox.showwarning(
+            "Duplicate Cards",
+            f"{self.database.duplicate_cards_message()}.\n\n"
+            "Nothing was deleted. Edit or delete the extra cards; imports are "
+            "disabled until each card is unique."
+        )
+    
+    def report_startup(self):
+        """Print the login breakdown once the main window is idle"""
+        self.startup_timer.mark('show main window')
+        print(self.startup_timer.report("Login to main window"), file=sys.stderr)
     
     def center_window(self, window):
         """Center window on screen"""
@@ -505,15 +452,88 @@ class MainWindow:
         refresh_btn = ttk.Button(button_frame, text="Refresh", command=self.refresh_cards)
         refresh_btn.pack(side="left", padx=5)
         
-        export_btn = ttk.Button(button_frame, text="Export Excel", command=self.export_cards)
+        export_btn = ttk.Button(button_frame, text="Export", command=self.export_cards)
         export_btn.pack(side="left", padx=5)
         
-        import_btn = ttk.Button(button_frame, text="Import Excel", command=self.import_cards)
+        import_btn = ttk.Button(button_frame, text="Import", command=self.import_cards)
         import_btn.pack(side="left", padx=5)
         
+        dashboard_btn = ttk.Button(button_frame, text="Dashboard", command=self.show_dashboard)
+        dashboard_btn.pack(side="left", padx=5)
+        
+        diagnostics_btn = ttk.Button(button_frame, text="Diagnostics", command=self.show_diagnostics)
+        diagnostics_btn.pack(side="left", padx=5)
+        
         logout_btn = ttk.Button(button_frame, text="Logout", command=self.logout)
         logout_btn.pack(side="left", padx=5)
         
+        # Filter bar
+        self.filters = {}
+        filter_frame = ttk.Frame(self.root)
+        filter_frame.pack(fill="x", padx=20)
+        
+        ttk.Label(filter_frame, text="Search:").pack(side="left")
+        self.search_entry = ttk.Entry(filter_frame, width=16)
+        self.search_entry.pack(side="left", padx=(2, 8))
+        self.search_entry.bind('<KeyRelease>', self.on_search_key)
+        self.search_job = None
+        self.search_generation = 0
+        self.searches_running = 0
+        self.search_results = queue.Queue()
+        
+        ttk.Label(filter_frame, text="Member:").pack(side="left")
+        self.member_filter = ttk.Combobox(filter_frame, width=12)
+        self.member_filter.configure(postcommand=lambda: self.load_filter_values(self.member_filter, 'family_member'))
+        self.member_filter.pack(side="left", padx=(2, 8))
+        
+        ttk.Label(filter_frame, text="Bank:").pack(side="left")
+        self.bank_filter = ttk.Combobox(filter_frame, width=12)
+        self.bank_filter.configure(postcommand=lambda: self.load_filter_values(self.bank_filter, 'bank_name'))
+        self.bank_filter.pack(side="left", padx=(2, 8))
+        
+        ttk.Label(filter_frame, text="Type:").pack(side="left")
+        self.type_filter = ttk.Combobox(filter_frame, values=["", "Debit", "Credit"], state="readonly", width=7)
+        self.type_filter.pack(side="left", padx=(2, 8))
+        
+        ttk.Label(filter_frame, text="Network:").pack(side="left")
+        self.network_filter = ttk.Combobox(filter_frame, values=["", "RuPay", "Visa", "Mastercard", "American Express", 
+                                                                 "Discover", "JCB", "UnionPay", "Diners Club"], 
+                                           state="readonly", width=10)
+        self.network_filter.pack(side="left", padx=(2, 8))
+        
+        ttk.Label(filter_frame, text="Expires:").pack(side="left")
+        self.expiry_from_filter = ttk.Entry(filter_frame, width=11)
+        self.expiry_from_filter.pack(side="left", padx=2)
+        ttk.Label(filter_frame, text="to").pack(side="left")
+        self.expiry_to_filter = ttk.Entry(filter_frame, width=11)
+        self.expiry_to_filter.pack(side="left", padx=(2, 8))
+        
+        ttk.Button(filter_frame, text="Filter", command=self.apply_filters).pack(side="left", padx=2)
+        ttk.Button(filter_frame, text="Clear", command=self.clear_filters).pack(side="left", padx=2)
+        
+        for widget in (self.member_filter, self.bank_filter, self.expiry_from_filter, self.expiry_to_filter):
+            widget.bind('<Return>', lambda e: self.apply_filters())
+        
+        # Expiring-soon panel, kept current by the expiry scheduler
+        expiry_frame = ttk.LabelFrame(self.root, text=f"Expiring within {EXPIRY_ALERT_DAYS} days")
+        expiry_frame.pack(fill="x", padx=20, pady=(10, 0))
+        
+        expiry_columns = (("Valid Until", 80), ("Days Left", 60), ("Member", 100), ("Bank", 120), ("ATM", 140))
+        self.expiry_tree = ttk.Treeview(expiry_frame, columns=[name for name, _ in expiry_columns],
+                                        show="headings", height=EXPIRY_LIST_HEIGHT)
+        for name, width in expiry_columns:
+            self.expiry_tree.heading(name, text=name)
+            self.expiry_tree.column(name, width=width)
+        self.expiry_tree.pack(fill="x", padx=5, pady=5)
+        self.expiry_tree.bind("<Double-1>", self.edit_expiring_card)
+        
+        self.expiry_watch = ExpiryWatch(self.database)
+        self.expiry_results = queue.Queue()
+        self.expiry_job = None
+        self.expiry_running = False
+        self.expiry_requested = False
+        self.expiry_shown_day = None
+        
         # Cards frame
         cards_frame = ttk.Frame(self.root)
         cards_frame.pack(fill="both", expand=True, padx=20, pady=10)
@@ -541,13 +561,25 @@ class MainWindow:
         self.tree.column("Member", width=80)
         self.tree.column("Valid Until", width=80)
         
+        # Clicking a heading sorts by it in SQL; newest first until then
+        self.sort = DEFAULT_CARD_SORT
+        self.sort_descending = True
+        self.heading_texts = {column: self.tree.heading(column, "text") for column in columns}
+        for column in columns:
+            self.tree.heading(column, command=lambda column=column: self.sort_by(column))
+        
         # Scrollbar
-        scrollbar = ttk.Scrollbar(cards_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(cards_frame, orient="vertical")
         
         self.tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
+        # Only the visible rows live in the tree; pages come from the database
+        self.card_list = VirtualCardList(
+            self.tree, scrollbar, self.count_listed_cards, self.fetch_listed_page,
+            self.fetch_listed_card
+        )
+        
         # Bind double-click for editing
         self.tree.bind("<Double-1>", self.edit_card)
         
@@ -564,33 +596,235 @@ class MainWindow:
         status_label.pack(fill="x")
         
         # Bind selection change to update status
-        self.tree.bind("<<TreeviewSelect>>", self.update_status)
+        self.tree.bind("<<TreeviewSelect>>", self.update_status, add="+")
     
     def refresh_cards(self):
         """Refresh the cards display"""
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self.database.take_changes()
+        self.card_list.reload()
+        self.check_expiring()
+    
+    def apply_changes(self):
+        """Patch the cards display with the rows changed since the last refresh"""
+        changes = self.database.take_changes()
+        if changes:
+            if changes.updated and self.sort != DEFAULT_CARD_SORT:
+                # An edit may have moved the card within a column sort
+                self.card_list.reload()
+            else:
+                self.card_list.apply_changes(changes)
+            self.check_expiring()
+    
+    def sort_by(self, column):
+        """Sort the list by a heading, toggling the direction on repeat clicks"""
+        sort = LIST_SORT_COLUMNS[column]
+        if sort == self.sort:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort = sort
+            self.sort_descending = False
         
-        # Get cards from database
-        cards = self.database.get_all_cards()
+        arrow = " ▼" if self.sort_descending else " ▲"
+        for name, text in self.heading_texts.items():
+            self.tree.heading(name, text=text + arrow if LIST_SORT_COLUMNS[name] == sort else text)
         
-        # Add cards to treeview
-        for card in cards:
-            self.tree.insert("", "end", values=(
-                card['bank_name'],
-                card['branch_name'],
-                card['account_number'],
-                card['atm_number'],
-                card['card_type'],
-                card['card_network'],
-                card['family_member'],
-                card['validity_end']
-            ), tags=(card['id'],))
+        if self.searches_running:
+            # Supersede the search in flight so its first page comes back in this order
+            self.start_search()
+            return
+        self.card_list.first = 0
+        self.card_list.reload()
+    
+    def check_expiring(self):
+        """Expiry scheduler tick: refresh the expiry window on a worker thread"""
+        if self.expiry_running:
+            # Run again as soon as the tick in flight finishes
+            self.expiry_requested = True
+            return
+        if self.expiry_job is not None:
+            self.root.after_cancel(self.expiry_job)
+            self.expiry_job = None
+        
+        def worker():
+            try:
+                result = self.expiry_watch.refresh()
+            except Exception as e:
+                result = e
+            self.expiry_results.put(result)
+        
+        self.expiry_running = True
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(JOB_POLL_MS, self.poll_expiring)
+    
+    def poll_expiring(self):
+        """Show a finished expiry tick and schedule the next one"""
+        try:
+            result = self.expiry_results.get_nowait()
+        except queue.Empty:
+            self.root.after(JOB_POLL_MS, self.poll_expiring)
+            return
+        
+        self.expiry_running = False
+        if isinstance(result, Exception):
+            self.status_var.set(f"Expiry check failed: {result}")
+        elif any(result) or self.expiry_shown_day != datetime.now().date():
+            self.show_expiring(result)
+        
+        if self.expiry_requested:
+            self.expiry_requested = False
+            self.check_expiring()
+        else:
+            self.expiry_job = self.root.after(EXPIRY_CHECK_MS, self.check_expiring)
+    
+    def show_expiring(self, update):
+        """Redraw the expiring-soon panel"""
+        today = datetime.now().date()
+        self.expiry_shown_day = today
+        self.expiry_tree.delete(*self.expiry_tree.get_children())
+        for card in self.expiry_watch.expiring_cards():
+            days_left = (datetime.strptime(card.expires_on, "%Y-%m-%d").date() - today).days
+            self.expiry_tree.insert("", "end", tags=(card.id,), values=(
+                card.validity_end, days_left, card.family_member, card.bank_name, card.atm_number
+            ))
+        
+        if update.entered:
+            self.status_var.set(f"{len(update.entered)} card(s) now expire within {EXPIRY_ALERT_DAYS} days")
+    
+    def edit_expiring_card(self, event=None):
+        """Edit the card double-clicked in the expiring-soon panel"""
+        selection = self.expiry_tree.selection()
+        if not selection:
+            return
+        
+        card = self.database.get_card_by_id(int(self.expiry_tree.item(selection[0], "tags")[0]))
+        if card:
+            EditCardDialog(self.root, self.database, card, self.apply_changes)
+        else:
+            messagebox.showerror("Error", "Card not found!")
+    
+    def count_listed_cards(self):
+        """Count the cards matching the current filters"""
+        return self.database.count_cards(self.filters)
+    
+    def fetch_listed_page(self, offset, limit, after=None):
+        """Fetch one page of the filtered card listing"""
+        return self.database.get_cards_page(offset, limit, after, self.filters, self.sort, self.sort_descending)
+    
+    def fetch_listed_card(self, card_id):
+        """Fetch one card if it is part of the filtered listing"""
+        return self.database.get_masked_card(card_id, self.filters)
+    
+    def load_filter_values(self, combobox, name):
+        """Fill a filter combobox with the values present in the vault"""
+        combobox.configure(values=[""] + self.database.get_filter_values(name))
+    
+    def read_filter_bar(self):
+        """Collect the filter bar values, or None if a date is invalid"""
+        filters = {
+            'search': self.search_entry.get().strip(),
+            'family_member': self.member_filter.get().strip(),
+            'bank_name': self.bank_filter.get().strip(),
+            'card_type': self.type_filter.get(),
+            'card_network': self.network_filter.get(),
+            'expiry_from': self.expiry_from_filter.get().strip(),
+            'expiry_to': self.expiry_to_filter.get().strip(),
+        }
+        
+        # Validate date format
+        try:
+            for name in ('expiry_from', 'expiry_to'):
+                if filters[name]:
+                    datetime.strptime(filters[name], "%Y-%m-%d")
+        except ValueError:
+            messagebox.showerror("Error", "Please enter valid dates in YYYY-MM-DD format!")
+            return None
+        
+        return {name: value for name, value in filters.items() if value}
+    
+    def apply_filters(self):
+        """Apply the filter bar to the card list"""
+        filters = self.read_filter_bar()
+        if filters is None:
+            return
+        
+        self.search_generation += 1
+        self.filters = filters
+        self.card_list.first = 0
+        self.refresh_cards()
+    
+    def on_search_key(self, event=None):
+        """Debounce typing in the search box"""
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(SEARCH_DEBOUNCE_MS, self.start_search)
+    
+    def start_search(self):
+        """Run the search on a worker thread, superseding any search in flight"""
+        self.search_job = None
+        filters = self.read_filter_bar()
+        if filters is None:
+            return
+        
+        self.search_generation += 1
+        generation = self.search_generation
+        sort, descending = self.sort, self.sort_descending
+        
+        def cancelled():
+            return generation != self.search_generation
+        
+        def worker():
+            try:
+                result = self.database.search_cards(
+                    filters.get('search', ''), filters, LIST_PAGE_SIZE, cancelled, sort, descending
+                )
+            except Exception as e:
+                result = e
+            self.search_results.put((generation, filters, result))
+        
+        self.searches_running += 1
+        threading.Thread(target=worker, daemon=True).start()
+        if self.searches_running == 1:
+            self.poll_search_results()
+    
+    def poll_search_results(self):
+        """Show finished searches; results of superseded searches are dropped"""
+        while True:
+            try:
+                generation, filters, result = self.search_results.get_nowait()
+            except queue.Empty:
+                break
+            
+            self.searches_running -= 1
+            if generation != self.search_generation:
+                continue
+            if isinstance(result, Exception):
+                self.status_var.set(f"Search failed: {result}")
+                continue
+            
+            total, first_page = result
+            self.filters = filters
+            self.database.take_changes()
+            self.card_list.show_results(total, first_page)
+            self.status_var.set(f"{total} matching cards")
+        
+        if self.searches_running:
+            self.root.after(SEARCH_POLL_MS, self.poll_search_results)
+    
+    def clear_filters(self):
+        """Reset the filter bar and show every card"""
+        for widget in (self.search_entry, self.member_filter, self.bank_filter, self.expiry_from_filter, self.expiry_to_filter):
+            widget.delete(0, tk.END)
+        self.type_filter.set("")
+        self.network_filter.set("")
+        
+        self.search_generation += 1
+        self.filters = {}
+        self.card_list.first = 0
+        self.refresh_cards()
     
     def add_card(self):
         """Show add card dialog"""
-        AddCardDialog(self.root, self.database, self.refresh_cards)
+        AddCardDialog(self.root, self.database, self.apply_changes)
     
     def edit_card(self, event=None):
         """Edit selected card"""
@@ -605,7 +839,7 @@ class MainWindow:
         # Get card details
         card = self.database.get_card_by_id(int(card_id))
         if card:
-            EditCardDialog(self.root, self.database, card, self.refresh_cards)
+            EditCardDialog(self.root, self.database, card, self.apply_changes)
         else:
             messagebox.showerror("Error", "Card not found!")
     
@@ -634,7 +868,7 @@ class MainWindow:
             
             try:
                 self.database.delete_card(int(card_id))
-                self.refresh_cards()
+                self.apply_changes()
                 messagebox.showinfo("Success", "Card deleted successfully!")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to delete card: {e}")
@@ -668,38 +902,69 @@ Valid Until: {card['validity_end']}"""
             messagebox.showinfo("Copied", "Card details copied to clipboard!")
     
     def export_cards(self):
-        """Export cards to Excel"""
+        """Export cards in the background; the file extension picks the format"""
         filename = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")]
+            filetypes=FILE_TYPES
         )
         
         if filename:
             try:
-                count = self.database.export_to_excel(filename)
-                messagebox.showinfo("Success", f"Exported {count} cards to {filename}")
-            except Exception as e:
+                self.database.file_format(filename)
+            except ValueError as e:
                 messagebox.showerror("Error", f"Export failed: {e}")
+                return
+            
+            def done(count, error):
+                if isinstance(error, JobCancelled):
+                    messagebox.showinfo("Export Cancelled", "Export cancelled, no file was written.")
+                elif error:
+                    messagebox.showerror("Error", f"Export failed: {error}")
+                else:
+                    messagebox.showinfo("Success", f"Exported {count} cards to {filename}")
+            
+            JobDialog(self.root, "Exporting Cards",
+                      lambda progress, cancelled: self.database.export_file(filename, progress, cancelled),
+                      done)
     
     def import_cards(self):
-        """Import cards from Excel"""
+        """Import cards in the background; the file extension picks the format"""
         filename = filedialog.askopenfilename(
-            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")]
+            filetypes=FILE_TYPES
         )
         
         if filename:
-            try:
-                imported, skipped = self.database.import_from_excel(filename)
-                messagebox.showinfo("Import Complete", 
-                    f"Successfully imported {imported} cards.\n"
-                    f"Skipped {skipped} invalid entries.")
-                self.refresh_cards()  # Refresh the display
-            except Exception as e:
-                messagebox.showerror("Error", f"Import failed: {e}")
+            def done(result, error):
+                if isinstance(error, JobCancelled):
+                    messagebox.showinfo("Import Cancelled", "Import cancelled, no cards were added.")
+                elif error:
+                    messagebox.showerror("Error", f"Import failed: {error}")
+                else:
+                    self.apply_changes()  # Patch the display
+                    messagebox.showinfo("Import Complete", 
+                        f"Successfully imported {result.imported} cards: "
+                        f"{result.inserted} new, {result.updated} updated, "
+                        f"{result.unchanged} unchanged"
+                        f"{f', {result.deleted} deleted' if result.deleted else ''}.\n"
+                        f"Skipped {result.skipped} invalid entries.")
+            
+            JobDialog(self.root, "Importing Cards",
+                      lambda progress, cancelled: self.database.import_file(
+                          filename, progress=progress, cancelled=cancelled, atomic=True),
+                      done)
+    
+    def show_dashboard(self):
+        """Open the card totals dashboard"""
+        DashboardWindow(self.root, self.database)
+    
+    def show_diagnostics(self):
+        """Open the latency diagnostics window"""
+        DiagnosticsWindow(self.root, self.database)
     
     def logout(self):
         """Logout and close application"""
         if messagebox.askyesno("Logout", "Are you sure you want to logout?"):
+            self.database.close()
             self.root.destroy()
     
     def run(self):
@@ -722,6 +987,280 @@ Valid Until: {card['validity_end']}"""
         else:
             self.status_var.set("Ready - Select a card to edit or right-click for options")
 
+class JobDialog:
+    """Progress dialog for a database job running on a worker thread
+    
+    work(progress, cancelled) runs on the worker; progress(done, total) may be
+    called from there. on_done(result, error) is called on the Tk thread.
+    """
+    
+    def __init__(self, parent, title, work, on_done):
+        self.parent = parent
+        self.work = work
+        self.on_done = on_done
+        
+        self.cancel_event = threading.Event()
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.finished = False
+        
+        # Create dialog
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title(title)
+        self.dialog.geometry("400x150")
+        self.dialog.resizable(False, False)
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.cancel)
+        
+        # Center dialog
+        self.center_window(self.dialog)
+        
+        self.create_widgets()
+        
+        self.started = time.monotonic()
+        threading.Thread(target=self.run, daemon=True).start()
+        self.dialog.after(JOB_POLL_MS, self.poll)
+    
+    def center_window(self, window):
+        """Center window on screen"""
+        window.update_idletasks()
+        width = window.winfo_width()
+        height = window.winfo_height()
+        x = (window.winfo_screenwidth() // 2) - (width // 2)
+        y = (window.winfo_screenheight() // 2) - (height // 2)
+        window.geometry(f'{width}x{height}+{x}+{y}')
+    
+    def create_widgets(self):
+        """Create progress widgets"""
+        self.progress_bar = ttk.Progressbar(self.dialog, mode="indeterminate", length=340)
+        self.progress_bar.pack(pady=(20, 10))
+        self.progress_bar.start()
+        
+        self.status_var = tk.StringVar(value="Starting...")
+        ttk.Label(self.dialog, textvariable=self.status_var).pack(pady=5)
+        
+        self.cancel_btn = ttk.Button(self.dialog, text="Cancel", command=self.cancel)
+        self.cancel_btn.pack(pady=10)
+    
+    def run(self):
+        """Worker thread body"""
+        try:
+            self.result = self.work(self.report_progress, self.cancel_event.is_set)
+        except Exception as e:
+            self.error = e
+        self.finished = True
+    
+    def report_progress(self, done, total=None):
+        """Record progress from the worker; the Tk thread picks it up in poll()"""
+        self.done = done
+        self.total = total
+    
+    def poll(self):
+        """Refresh the progress display and deliver completion on the Tk thread"""
+        if self.finished:
+            self.dialog.grab_release()
+            self.dialog.destroy()
+            self.on_done(self.result, self.error)
+            return
+        
+        done, total = self.done, self.total
+        elapsed = time.monotonic() - self.started
+        rate = done / elapsed if elapsed > 0 else 0
+        
+        if total:
+            if str(self.progress_bar.cget("mode")) != "determinate":
+                self.progress_bar.stop()
+                self.progress_bar.configure(mode="determinate", maximum=total)
+            self.progress_bar.configure(value=min(done, total))
+            eta = (total - done) / rate if rate else 0
+            status = f"{done:,} / {total:,} rows - {rate:,.0f} rows/s - ETA {int(eta // 60)}:{int(eta % 60):02d}"
+        else:
+            status = f"{done:,} rows - {rate:,.0f} rows/s"
+        
+        if self.cancel_event.is_set():
+            status = "Cancelling... " + status
+        self.status_var.set(status)
+        self.dialog.after(JOB_POLL_MS, self.poll)
+    
+    def cancel(self):
+        """Ask the worker to stop; it rolls back at its next checkpoint"""
+        self.cancel_event.set()
+        self.cancel_btn.configure(state="disabled")
+
+class DashboardWindow:
+    """Card totals by type, network, bank and member, from the summary counters"""
+    
+    def __init__(self, parent, database):
+        self.database = database
+        self.stats = None
+        
+        self.window = tk.Toplevel(parent)
+        self.window.title("Dashboard")
+        self.window.geometry("420x460")
+        self.window.transient(parent)
+        
+        self.create_widgets()
+        self.refresh()
+    
+    def create_widgets(self):
+        """Create dashboard widgets"""
+        self.total_var = tk.StringVar()
+        ttk.Label(self.window, textvariable=self.total_var, font=("Arial", 14, "bold")).pack(anchor="w", padx=10, pady=10)
+        
+        tree_frame = ttk.Frame(self.window)
+        tree_frame.pack(fill="both", expand=True, padx=10)
+        
+        self.tree = ttk.Treeview(tree_frame, columns=("Cards",), height=16)
+        self.tree.heading("#0", text="Breakdown")
+        self.tree.heading("Cards", text="Cards")
+        self.tree.column("#0", width=280)
+        self.tree.column("Cards", width=80, anchor="e")
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        self.sections = {}
+        for name in STATS_COLUMNS:
+            self.sections[name] = self.tree.insert("", "end", text=STATS_LABELS[name], open=name == 'card_type')
+        
+        ttk.Button(self.window, text="Close", command=self.window.destroy).pack(pady=10)
+    
+    def refresh(self):
+        """Redraw the totals when they changed and re-arm the auto refresh"""
+        if not self.window.winfo_exists():
+            return
+        
+        stats = self.database.get_card_stats()
+        if stats != self.stats:
+            self.stats = stats
+            self.total_var.set(f"Total cards: {stats['total_cards']}")
+            for name, section in self.sections.items():
+                self.tree.delete(*self.tree.get_children(section))
+                for value, count in stats[name].items():
+                    self.tree.insert(section, "end", text=value, values=(count,))
+        self.window.after(DASHBOARD_REFRESH_MS, self.refresh)
+
+class DiagnosticsWindow:
+    """Per-operation latency percentiles from the database tracer"""
+    
+    COLUMNS = ("Operation", "Calls", "p50 ms", "p95 ms", "p99 ms", "Max ms")
+    
+    def __init__(self, parent, database):
+        self.database = database
+        
+        self.window = tk.Toplevel(parent)
+        self.window.title("Diagnostics")
+        self.window.geometry("620x400")
+        self.window.transient(parent)
+        
+        self.create_widgets()
+        self.refresh()
+    
+    def create_widgets(self):
+        """Create diagnostics widgets"""
+        self.trace_var = tk.BooleanVar(value=self.database.tracer.enabled)
+        ttk.Checkbutton(self.window, text="Record operation traces", variable=self.trace_var,
+                        command=self.toggle_tracing).pack(anchor="w", padx=10, pady=(10, 5))
+        
+        tree_frame = ttk.Frame(self.window)
+        tree_frame.pack(fill="both", expand=True, padx=10)
+        
+        self.tree = ttk.Treeview(tree_frame, columns=self.COLUMNS, show="headings", height=12)
+        for column in self.COLUMNS:
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=180 if column == "Operation" else 80,
+                             anchor="w" if column == "Operation" else "e")
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        self.cache_var = tk.StringVar()
+        ttk.Label(self.window, textvariable=self.cache_var).pack(anchor="w", padx=10, pady=5)
+        
+        button_frame = ttk.Frame(self.window)
+        button_frame.pack(pady=(0, 10))
+        ttk.Button(button_frame, text="Refresh", command=self.refresh).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="Save Trace...", command=self.save_trace).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="Clear", command=self.clear).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="Close", command=self.window.destroy).pack(side="left", padx=5)
+    
+    def toggle_tracing(self):
+        """Switch span recording on or off"""
+        self.database.tracer.enabled = self.trace_var.get()
+    
+    def refresh(self):
+        """Redraw the latency table and re-arm the auto refresh"""
+        if not self.window.winfo_exists():
+            return
+        
+        self.tree.delete(*self.tree.get_children())
+        stats = self.database.latency_stats()
+        for name in sorted(stats, key=lambda name: stats[name]['p95'], reverse=True):
+            row = stats[name]
+            self.tree.insert("", "end", values=(
+                name, row['count'], f"{row['p50']:.2f}", f"{row['p95']:.2f}",
+                f"{row['p99']:.2f}", f"{row['max']:.2f}"
+            ))
+        
+        cache = self.database.cache_stats()
+        self.cache_var.set(f"Card cache: {cache['size']}/{cache['max_size']} cards, "
+                           f"{cache['hit_rate']:.0%} hit rate ({cache['hits']} hits, {cache['misses']} misses)")
+        self.window.after(DIAGNOSTICS_REFRESH_MS, self.refresh)
+    
+    def save_trace(self):
+        """Write the recorded spans to a Chrome trace or JSON file"""
+        filename = filedialog.asksaveasfilename(
+            parent=self.window,
+            title="Save Trace",
+            defaultextension=".json",
+            filetypes=[("Chrome trace", "*.json"), ("Span list", "*.spans.json")]
+        )
+        if not filename:
+            return
+        
+        trace_format = 'json' if filename.endswith('.spans.json') else 'chrome'
+        try:
+            count = self.database.dump_trace(filename, trace_format)
+            messagebox.showinfo("Save Trace", f"Saved {count} spans to {filename}", parent=self.window)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save trace: {e}", parent=self.window)
+    
+    def clear(self):
+        """Forget every recorded span"""
+        self.database.tracer.clear()
+        self.tree.delete(*self.tree.get_children())
+
+def validated_card_form(dialog, stored=None):
+    """Check an add/edit card dialog's fields with the shared card rules
+    
+    stored is the card being edited, whose unchanged fields are not checked
+    again. Returns the add_card/update_card arguments, or None after showing
+    every problem found.
+    """
+    card, errors = CARD_VALIDATOR.validate({
+        'bank_name': dialog.bank_name.get(),
+        'branch_name': dialog.branch_name.get(),
+        'ifsc_code': dialog.ifsc_code.get(),
+        'account_number': dialog.account_number.get(),
+        'atm_number': dialog.atm_number.get(),
+        'pin': dialog.pin.get(),
+        'validity_start': dialog.validity_start.get(),
+        'validity_end': dialog.validity_end.get(),
+        'cvv': dialog.cvv.get(),
+        'card_type': dialog.card_type_var.get(),
+        'card_network': dialog.card_network_var.get(),
+        'family_member': dialog.family_member.get()
+    }, stored)
+    if errors:
+        messagebox.showerror("Error", "\n".join(error.message for error in errors))
+        return None
+    return CARD_VALIDATOR.values(card)
+
 class AddCardDialog:
     """Dialog for adding cards"""
     
@@ -881,43 +1420,12 @@ class AddCardDialog:
     
     def save_card(self):
         """Save the new card"""
-        # Get values
-        bank_name = self.bank_name.get().strip()
-        branch_name = self.branch_name.get().strip()
-        ifsc_code = self.ifsc_code.get().strip()
-        account_number = ''.join(filter(str.isdigit, self.account_number.get().strip()))
-        atm_number = ''.join(filter(str.isdigit, self.atm_number.get().strip()))
-        pin = self.pin.get()
-        cvv = self.cvv.get()
-        card_type = self.card_type_var.get()
-        card_network = self.card_network_var.get()
-        validity_start = self.validity_start.get().strip()
-        validity_end = self.validity_end.get().strip()
-        family_member = self.family_member.get().strip()
-        
-        # Validate ATM number length
-        if len(atm_number) != 16:
-            messagebox.showerror("Error", "ATM number must be exactly 16 digits!")
+        card = validated_card_form(self)
+        if card is None:
             return
         
-        # Validate
-        if not all([bank_name, branch_name, ifsc_code, account_number, atm_number, pin, cvv, validity_start, validity_end, family_member]):
-            messagebox.showerror("Error", "All fields are required!")
-            return
-        
-        # Validate date format
         try:
-            datetime.strptime(validity_start, "%Y-%m-%d")
-            datetime.strptime(validity_end, "%Y-%m-%d")
-        except ValueError:
-            messagebox.showerror("Error", "Please enter valid dates in YYYY-MM-DD format!")
-            return
-        
-        try:
-            card_id = self.database.add_card(
-                bank_name, branch_name, ifsc_code, account_number, atm_number, pin,
-                validity_start, validity_end, cvv, card_type, card_network, family_member
-            )
+            card_id = self.database.add_card(*card)
             messagebox.showinfo("Success", f"Card added successfully! ID: {card_id}")
             self.dialog.destroy()
             self.callback()
@@ -1105,54 +1613,30 @@ class EditCardDialog:
     
     def update_card(self):
         """Update the card"""
-        # Get values
-        bank_name = self.bank_name.get().strip()
-        branch_name = self.branch_name.get().strip()
-        ifsc_code = self.ifsc_code.get().strip()
-        account_number = ''.join(filter(str.isdigit, self.account_number.get().strip()))
-        atm_number = ''.join(filter(str.isdigit, self.atm_number.get().strip()))
-        pin = self.pin.get()
-        cvv = self.cvv.get()
-        card_type = self.card_type_var.get()
-        card_network = self.card_network_var.get()
-        validity_start = self.validity_start.get().strip()
-        validity_end = self.validity_end.get().strip()
-        family_member = self.family_member.get().strip()
-        
-        # Validate ATM number length
-        if len(atm_number) != 16:
-            messagebox.showerror("Error", "ATM number must be exactly 16 digits!")
-            return
-        
-        # Validate
-        if not all([bank_name, branch_name, ifsc_code, account_number, atm_number, pin, cvv, validity_start, validity_end, family_member]):
-            messagebox.showerror("Error", "All fields are required!")
+        card = validated_card_form(self, self.card)
+        if card is None:
             return
         
-        # Validate date format
         try:
-            datetime.strptime(validity_start, "%Y-%m-%d")
-            datetime.strptime(validity_end, "%Y-%m-%d")
-        except ValueError:
-            messagebox.showerror("Error", "Please enter valid dates in YYYY-MM-DD format!")
-            return
-        
-        try:
-            self.database.update_card(
-                self.card['id'], bank_name, branch_name, ifsc_code, account_number, 
-                atm_number, pin, validity_start, validity_end, cvv, card_type, 
-                card_network, family_member
-            )
+            self.database.update_card(self.card['id'], *card)
             messagebox.showinfo("Success", "Card updated successfully!")
             self.dialog.destroy()
             self.callback()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update card: {e}")
 
-def main():
+def main(argv=None):
     """Main function"""
-    app = LoginWindow()
+    argv = sys.argv[1:] if argv is None else argv
+    startup_timer = None
+    if '--startup-times' in argv or os.environ.get(STARTUP_TIMES_ENV_VAR, '') not in ('', '0'):
+        startup_timer = StartupTimer(STARTUP_STARTED)
+        startup_timer.mark('import modules')
+    
+    app = LoginWindow(startup_timer)
     app.run()
 
 if __name__ == '__main__':
+    # Import workers re-launch the packaged executable on Windows
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
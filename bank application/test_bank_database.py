@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Headless tests for bank_database: schema migration, upserts, deltas and paging
+
+Run from this directory with `python -m unittest test_bank_database` (or pytest).
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from bank_database import (CARD_SORTS, CARD_VALUE_COLUMNS, SCHEMA_VERSION, CompleteDatabase,
+                           DuplicateCardError, StartupTimer)
+
+# The vault shipped with the application, still in the original (unversioned) schema
+BASELINE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'complete_bank_manager.db')
+
+def card_values(number, **changes):
+    """CARD_VALUE_COLUMNS values for a test card, overridden by changes"""
+    card = {
+        'bank_name': f'Bank {number % 3}',
+        'branch_name': f'Branch {number % 4}',
+        'ifsc_code': f'BANK0{number:06d}',
+        'account_number': f'{9000000000 + number}',
+        'atm_number': f'{4000000000000000 + number}',
+        'pin': '1234',
+        'validity_start': '2024-01-01',
+        # A free-text expiry leaves expires_on NULL
+        'validity_end': 'n/a' if number % 5 == 0 else f'{2026 + number % 3}-0{1 + number % 9}-15',
+        'cvv': '123',
+        'card_type': ('Debit', 'Credit')[number % 2],
+        'card_network': ('Visa', 'RuPay', 'Mastercard')[number % 3],
+        'family_member': f'Member {number % 2}',
+    }
+    card.update(changes)
+    return tuple(card[column] for column in CARD_VALUE_COLUMNS)
+
+def upsert_record(number, created_at='2025-01-01T00:00:00', **changes):
+    """A bulk_upsert_cards() record: card values plus created_at and updated_at"""
+    return card_values(number, **changes) + (created_at, created_at)
+
+def vault_cards(database):
+    """A vault's cards without ids or timestamps, for comparing two vaults"""
+    return sorted(tuple(card[column] for column in CARD_VALUE_COLUMNS) for card in database.get_all_cards_unmasked())
+
+class VaultTestCase(unittest.TestCase):
+    """Each test gets its own directory; vaults opened with open_vault() are closed after it"""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+    
+    def path(self, name):
+        return os.path.join(self.directory, name)
+    
+    def open_vault(self, name='vault.db', **options):
+        database = CompleteDatabase('test password', self.path(name), **options)
+        self.addCleanup(database.close)
+        return database
+
+class MigrationTest(VaultTestCase):
+    """Opening vaults written by the original application"""
+    
+    def copy_baseline(self, name='vault.db'):
+        shutil.copy(BASELINE_DB, self.path(name))
+        return self.path(name)
+    
+    def baseline_rows(self, path):
+        with sqlite3.connect(path) as conn:
+            return sorted(conn.execute(f"SELECT {', '.join(CARD_VALUE_COLUMNS)} FROM bank_cards").fetchall())
+    
+    def test_baseline_vault_migrates(self):
+        path = self.copy_baseline()
+        rows = self.baseline_rows(path)
+        
+        database = self.open_vault()
+        
+        self.assertEqual(vault_cards(database), rows)
+        self.assertEqual(database.duplicate_cards, [])
+        with database.connections.read() as conn:
+            self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], SCHEMA_VERSION)
+            self.assertEqual(database._natural_key_columns(conn), database.natural_key)
+    
+    def test_migrated_vault_skips_migration(self):
+        self.copy_baseline()
+        self.open_vault().close()
+        
+        timer = StartupTimer()
+        self.open_vault(startup_timer=timer)
+        
+        phases = [phase for phase, _ in timer.phases]
+        self.assertIn('check schema version', phases)
+        self.assertNotIn('migrate schema', phases)
+    
+    def test_identical_copies_are_merged(self):
+        path = self.copy_baseline()
+        rows = self.baseline_rows(path)
+        with sqlite3.connect(path) as conn:
+            columns = ', '.join(CARD_VALUE_COLUMNS + ['created_at', 'updated_at'])
+            conn.execute(f"INSERT INTO bank_cards ({columns}) SELECT {columns} FROM bank_cards")
+        
+        database = self.open_vault()
+        
+        self.assertEqual(database.duplicate_cards, [])
+        self.assertEqual(vault_cards(database), rows)
+    
+    def test_conflicting_duplicates_are_kept_and_remembered(self):
+        path = self.copy_baseline()
+        with sqlite3.connect(path) as conn:
+            columns = ', '.join(CARD_VALUE_COLUMNS + ['created_at', 'updated_at'])
+            conn.execute(f"INSERT INTO bank_cards ({columns}) SELECT {columns} FROM bank_cards ORDER BY id LIMIT 1")
+            conn.execute("UPDATE bank_cards SET branch_name = 'Elsewhere' WHERE id = last_insert_rowid()")
+            total = conn.execute('SELECT COUNT(*) FROM bank_cards').fetchone()[0]
+        
+        database = self.open_vault()
+        duplicates = database.duplicate_cards
+        self.assertEqual(len(duplicates), 1)
+        self.assertEqual(len(database.get_all_cards()), total)
+        with self.assertRaises(DuplicateCardError):
+            database.bulk_upsert_cards([upsert_record(1)])
+        database.close()
+        
+        timer = StartupTimer()
+        database = self.open_vault(startup_timer=timer)
+        self.assertEqual(database.duplicate_cards, duplicates)
+        self.assertIn('check schema version', [phase for phase, _ in timer.phases])
+        
+        # Deleting one of the pair lets the index, and imports, in again
+        database.delete_card(max(duplicates[0]))
+        self.assertEqual(database.duplicate_cards, [])
+        self.assertEqual(database.bulk_upsert_cards([upsert_record(1)]), (1, 0, 0))
+
+class UpsertTest(VaultTestCase):
+    """bulk_upsert_cards() counts by natural key"""
+    
+    def test_counts(self):
+        database = self.open_vault()
+        records = [upsert_record(number) for number in range(10)]
+        
+        self.assertEqual(database.bulk_upsert_cards(records), (10, 0, 0))
+        self.assertEqual(database.bulk_upsert_cards(records), (0, 0, 10))
+        
+        records[3] = upsert_record(3, bank_name='Renamed')
+        records.append(upsert_record(10))
+        self.assertEqual(database.bulk_upsert_cards(records), (1, 1, 9))
+        self.assertEqual(len(database.get_all_cards()), 11)
+    
+    def test_key_repeated_in_one_batch(self):
+        database = self.open_vault()
+        database.bulk_upsert_cards([upsert_record(1)])
+        
+        # The last record for a key wins; the ones it supersedes count as unchanged
+        counts = database.bulk_upsert_cards([
+            upsert_record(1, bank_name='First'),
+            upsert_record(1, bank_name='Second'),
+            upsert_record(2, bank_name='New'),
+            upsert_record(2, bank_name='Newer'),
+        ])
+        
+        self.assertEqual(counts, (1, 1, 2))
+        banks = {card['atm_number']: card['bank_name'] for card in database.get_all_cards_unmasked()}
+        self.assertEqual(banks, {card_values(1)[4]: 'Second', card_values(2)[4]: 'Newer'})
+
+class DeltaTest(VaultTestCase):
+    """export_delta() and import_delta() keeping a second vault in step"""
+    
+    def test_round_trip(self):
+        source = self.open_vault('source.db')
+        target = self.open_vault('target.db')
+        source.bulk_upsert_cards([upsert_record(number) for number in range(20)])
+        
+        target.import_delta(self.export(source, 'full.delta.ndjson'))
+        self.assertEqual(vault_cards(target), vault_cards(source))
+        
+        cards = {card['atm_number']: card for card in source.get_all_cards_unmasked()}
+        rekeyed = cards[card_values(1)[4]]
+        source.update_card(rekeyed['id'], *card_values(1, atm_number='4999999999999999'))
+        edited = cards[card_values(2)[4]]
+        source.update_card(edited['id'], *card_values(2, bank_name='Edited'))
+        source.delete_card(cards[card_values(3)[4]]['id'])
+        # Deleted and then re-added: the target must end up with the new card only
+        source.delete_card(cards[card_values(4)[4]]['id'])
+        source.bulk_upsert_cards([upsert_record(4, branch_name='Reissued'), upsert_record(50)])
+        
+        summary = target.import_delta(self.export(source, 'changes.delta.ndjson'))
+        
+        self.assertEqual(vault_cards(target), vault_cards(source))
+        self.assertEqual(summary.deleted, 3)
+        self.assertEqual(summary.skipped, 0)
+        
+        # Exported changes are pruned; a new checkpoint still gets everything
+        with source.connections.read() as conn:
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM card_changes').fetchone()[0], 0)
+        fresh = self.open_vault('fresh.db')
+        fresh.import_delta(self.export(source, 'fresh.delta.ndjson', checkpoint='fresh'))
+        self.assertEqual(vault_cards(fresh), vault_cards(source))
+    
+    def test_change_log_keeps_only_the_natural_key(self):
+        database = self.open_vault()
+        database.bulk_upsert_cards([upsert_record(1)])
+        card = database.get_all_cards_unmasked()[0]
+        database.update_card(card['id'], *card_values(1, bank_name='Edited'))
+        database.delete_card(card['id'])
+        
+        with database.connections.read() as conn:
+            logged = [row[0] for row in conn.execute('SELECT old_card FROM card_changes WHERE old_card IS NOT NULL')]
+        self.assertEqual(logged, ['{"atm_number":"%s"}' % card['atm_number']] * 2)
+    
+    def export(self, database, name, checkpoint='test'):
+        database.export_delta(self.path(name), checkpoint=checkpoint)
+        return self.path(name)
+
+class PagingTest(VaultTestCase):
+    """Keyset pages add up to the full listing under every sort"""
+    
+    PAGE_SIZE = 4
+    
+    def test_keyset_pages_match_full_listing(self):
+        database = self.open_vault()
+        # Shared created_at values make the id tie-breaker matter
+        database.bulk_upsert_cards([
+            upsert_record(number, created_at=f'2025-01-0{1 + number % 3}T00:00:00') for number in range(23)
+        ])
+        
+        for sort in CARD_SORTS:
+            for descending in (True, False):
+                with self.subTest(sort=sort, descending=descending):
+                    listing = database.query_cards(limit=1000, sort=sort, descending=descending)
+                    self.assertEqual(len(listing), 23)
+                    
+                    paged = database.get_cards_page(0, self.PAGE_SIZE, sort=sort, descending=descending)
+                    while len(paged) % self.PAGE_SIZE == 0:
+                        page = database.get_cards_page(None, self.PAGE_SIZE, after=paged[-1],
+                                                       sort=sort, descending=descending)
+                        if not page:
+                            break
+                        paged += page
+                    self.assertEqual(paged, listing)
+                    
+                    streamed = list(database.iter_listed_cards(sort=sort, descending=descending,
+                                                               page_size=self.PAGE_SIZE))
+                    self.assertEqual(streamed, listing)
+
+if __name__ == '__main__':
+    unittest.main()